@@ -26,7 +26,10 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from pyrogram import Client
 
 from plugins import glovar
-from plugins.functions.timers import backup_files, interval_min_01, reset_data, update_status
+from plugins.functions.file import save_flush
+from plugins.functions.receive import receive_bus
+from plugins.functions.timers import backup_files, interval_sec_01, reset_data, update_status
+from plugins.functions.transport import transport_register
 
 # Enable logging
 logger = logging.getLogger(__name__)
@@ -38,12 +41,16 @@ app = Client(
 )
 app.start()
 
+# Receive the data of the bots in the same process
+if glovar.transport == "bus":
+    transport_register(lambda data: receive_bus(app, data))
+
 # Send online status
 update_status(app, "online")
 
 # Timer
 scheduler = BackgroundScheduler(job_defaults={"misfire_grace_time": 60})
-scheduler.add_job(interval_min_01, "interval", [app], minutes=1)
+scheduler.add_job(interval_sec_01, "interval", [app], seconds=1)
 scheduler.add_job(update_status, "cron", [app, "awake"], minute=randint(30, 34), second=randint(0, 59))
 scheduler.add_job(backup_files, "cron", [app], hour=20)
 scheduler.add_job(reset_data, "cron", [app], day=glovar.date_reset, hour=22)
@@ -54,3 +61,14 @@ app.idle()
 
 # Stop
 app.stop()
+
+# Flush pending saves
+save_flush()
+logger.info(f"Save stats: {glovar.save_stats}")
+logger.info(f"Backup stats: {glovar.backup_stats}")
+logger.info(f"Markup stats: {glovar.markup_stats}")
+logger.info(f"Pool stats: {glovar.pool_stats}")
+logger.info(f"Rate stats: {glovar.rate_stats}")
+logger.info(f"Share stats: {glovar.share_stats}")
+logger.info(f"Seen stats: {glovar.seen_stats}")
+logger.info(f"Transport stats: {glovar.transport_stats}")
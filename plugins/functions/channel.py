@@ -17,16 +17,21 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import logging
+from base64 import b85encode
 from json import dumps
-from typing import List, Union
+from queue import Empty, PriorityQueue
+from threading import Thread
+from time import time
+from typing import List, Tuple, Union
+from zlib import compress
 
 from pyrogram import Client
 
 from .. import glovar
-from .decorators import threaded
-from .etc import code, code_block, lang, thread
-from .file import crypt_file, delete_file, get_new_path
+from .etc import code, code_block, lang, random_str, thread
+from .file import crypt_data, delete_file, save
 from .telegram import send_document, send_message
+from .transport import transport_send
 
 # Enable logging
 logger = logging.getLogger(__name__)
@@ -60,12 +65,51 @@ def exchange_to_hide(client: Client) -> bool:
     return result
 
 
+def format_compact(sender: str, receivers: List[str], action: str, action_type: str,
+                   data: Union[bool, dict, int, str] = None, spill: bool = False) -> str:
+    # Get the compact exchange string, large data is compressed, the receivers stay readable
+    result = ""
+
+    try:
+        record = {
+            "v": 2,
+            "f": sender,
+            "r": receivers,
+            "a": action,
+            "t": action_type
+        }
+        body = dumps(data, separators=(",", ":"))
+        packed = len(body) > glovar.wire_compress and b85encode(compress(body.encode("utf-8"), 9)).decode("ascii")
+
+        if spill:
+            record["s"] = 1
+        elif packed and len(packed) < len(body):
+            record["z"] = packed
+        else:
+            record["d"] = data
+
+        result = dumps(record, separators=(",", ":"))
+    except Exception as e:
+        logger.warning(f"Format compact error: {e}", exc_info=True)
+
+    return result
+
+
 def format_data(sender: str, receivers: List[str], action: str, action_type: str,
-                data: Union[bool, dict, int, str] = None) -> str:
+                data: Union[bool, dict, int, str] = None, spill: bool = False) -> str:
     # Get exchange string
+    return code_block(format_text(sender, receivers, action, action_type, data, spill))
+
+
+def format_text(sender: str, receivers: List[str], action: str, action_type: str,
+                data: Union[bool, dict, int, str] = None, spill: bool = False) -> str:
+    # Get the exchange text before it is put into the code block
     result = ""
 
     try:
+        if glovar.wire == "compact":
+            return format_compact(sender, receivers, action, action_type, data, spill)
+
         data = {
             "from": sender,
             "to": receivers,
@@ -73,17 +117,169 @@ def format_data(sender: str, receivers: List[str], action: str, action_type: str
             "type": action_type,
             "data": data
         }
-        result = code_block(dumps(data, indent=4))
+
+        # Envelopes are packed without indent
+        if action == "envelope":
+            result = dumps(data, separators=(",", ":"))
+        else:
+            result = dumps(data, indent=4)
     except Exception as e:
-        logger.warning(f"Format data error: {e}", exc_info=True)
+        logger.warning(f"Format text error: {e}", exc_info=True)
+
+    return result
+
+
+def get_envelope(items: List[tuple]) -> Tuple[List[str], List[dict]]:
+    # Get the receivers and the records of an envelope from the queued items
+    receivers = []
+    records = []
+
+    try:
+        for item in items:
+            _, the_receivers, action, action_type, data = item[4][:5]
+            the_receivers = [receiver for receiver in the_receivers if receiver != glovar.sender]
+
+            if not the_receivers:
+                continue
+
+            records.append({
+                "id": item[5],
+                "from": glovar.sender,
+                "to": the_receivers,
+                "action": action,
+                "type": action_type,
+                "data": data
+            })
+            receivers += [receiver for receiver in the_receivers if receiver not in receivers]
+    except Exception as e:
+        logger.warning(f"Get envelope error: {e}", exc_info=True)
+
+        # A partial envelope would lose the other records, the caller sends them one by one
+        receivers = []
+        records = []
+
+    return receivers, records
+
+
+def get_priority(action: str, action_type: str, file: str = None) -> Tuple[str, str, int]:
+    # Get the lane, the class and the priority of the exchange data
+    if file:
+        return "file", "backup", 2
+
+    if action == "config" or action_type == "hide":
+        return "message", action_type if action == "config" else "hide", 0
+
+    return "message", "status", 1
+
+
+def get_share(lane: str) -> PriorityQueue:
+    # Get the outbound queue of the lane, start its sender on first use
+    result = glovar.share_queues.get(lane)
+
+    if result:
+        return result
+
+    with glovar.locks["share"]:
+        result = glovar.share_queues.get(lane)
+
+        if result:
+            return result
+
+        result = PriorityQueue()
+        t = Thread(target=share_work, args=(result,), name=f"{lane}-share", daemon=True)
+        t.start()
+        glovar.share_queues[lane] = result
 
     return result
 
 
-@threaded()
 def share_data(client: Client, receivers: List[str], action: str, action_type: str,
-               data: Union[bool, dict, int, str] = None, file: str = None, encrypt: bool = True) -> bool:
-    # Use this function to share data in the channel
+               data: Union[bool, dict, int, str] = None, file: str = None, encrypt: bool = True,
+               digest: str = None) -> bool:
+    # Use this function to share data in the channel, the data waits in the outbound queue of its lane
+    result = False
+
+    try:
+        lane, kind, priority = get_priority(action, action_type, file)
+
+        with glovar.locks["share"]:
+            glovar.share_count += 1
+            count = glovar.share_count
+
+        task = (client, receivers, action, action_type, data, file, encrypt, digest)
+        get_share(lane).put((priority, count, time(), kind, task, random_str(8)))
+
+        result = True
+    except Exception as e:
+        logger.warning(f"Share data error: {e}", exc_info=True)
+
+    return result
+
+
+def share_data_failed(client: Client, receivers: List[str], action: str, action_type: str,
+                      data: Union[bool, dict, int, str] = None, file: str = None, encrypt: bool = True,
+                      digest: str = None) -> bool:
+    # Sharing data failed, use the exchange channel instead
+    result = False
+
+    try:
+        exchange_to_hide(client)
+        result = share_send(
+            client=client,
+            receivers=receivers,
+            action=action,
+            action_type=action_type,
+            data=data,
+            file=file,
+            encrypt=encrypt,
+            digest=digest
+        )
+    except Exception as e:
+        logger.warning(f"Share data failed error: {e}", exc_info=True)
+
+    return result
+
+
+def share_envelope(queue: PriorityQueue, items: List[tuple]) -> bool:
+    # Collect more items of the queue into the envelope until the window closes or the envelope is full
+    result = False
+
+    try:
+        deadline = time() + glovar.envelope_window
+
+        while True:
+            remaining = deadline - time()
+
+            if remaining <= 0:
+                break
+
+            try:
+                item = queue.get(timeout=remaining)
+            except Empty:
+                break
+
+            receivers, records = get_envelope(items + [item])
+            size = len(dumps([receivers, records], separators=(",", ":")))
+
+            # The hide notice is always sent alone
+            if item[3] == "hide" or size > glovar.envelope_size:
+                queue.put(item)
+                queue.task_done()
+                break
+
+            items.append(item)
+
+        result = True
+    except Exception as e:
+        logger.warning(f"Share envelope error: {e}", exc_info=True)
+
+    return result
+
+
+def share_send(client: Client, receivers: List[str], action: str, action_type: str,
+               data: Union[bool, dict, int, str] = None, file: str = None, encrypt: bool = True,
+               digest: str = None) -> bool:
+    # Send the data to the channel, the digest of an uploaded data file is recorded after the upload
     result = False
 
     try:
@@ -98,18 +294,47 @@ def share_data(client: Client, receivers: List[str], action: str, action_type: s
         else:
             channel_id = glovar.exchange_channel_id
 
+        spill = False
+
+        # Deliver the text data to the bots in the same process, the others still read the channel
+        if glovar.transport == "bus" and not file:
+            record = {
+                "id": random_str(8),
+                "from": glovar.sender,
+                "to": receivers,
+                "action": action,
+                "type": action_type,
+                "data": data
+            }
+            rest = transport_send(receivers, record)
+
+            # Send an audit copy, the bots skip it by the record id
+            if not rest and glovar.transport_audit:
+                glovar.transport_stats["audit"] += 1
+                text = format_data(glovar.sender, receivers, "envelope", "records", [record])
+                return bool(send_message(client, channel_id, text))
+            elif not rest:
+                return True
+
+            receivers = rest
+
         # Plain text
         if not file:
-            text = format_data(
+            text = format_text(
                 sender=glovar.sender,
                 receivers=receivers,
                 action=action,
                 action_type=action_type,
                 data=data
             )
-            result = send_message(client, channel_id, text)
-            return ((result is not False or glovar.should_hide)
-                    or share_data_failed(client, receivers, action, action_type, data, file, encrypt))
+
+            if glovar.wire != "compact" or len(text) <= 4096:
+                result = send_message(client, channel_id, code_block(text))
+                return ((result is not False or glovar.should_hide)
+                        or share_data_failed(client, receivers, action, action_type, data, file, encrypt))
+
+            # Spill the data to an encrypted document
+            spill = True
 
         # Share with a file
         text = format_data(
@@ -117,52 +342,90 @@ def share_data(client: Client, receivers: List[str], action: str, action_type: s
             receivers=receivers,
             action=action,
             action_type=action_type,
-            data=data
+            data=None if spill else data,
+            spill=spill
         )
 
-        if encrypt:
-            # Encrypt the file, save to the tmp directory
-            file_path = get_new_path()
-            crypt_file("encrypt", file, file_path)
+        if spill:
+            # Encrypt the pickled data in memory, write it to the tmp directory once
+            file_path = crypt_data(data)
+        elif encrypt:
+            # Encrypt the file as a stream, write it to the tmp directory once
+            file_path = crypt_data(file=file)
         else:
             # Send directly
             file_path = file
 
+        if not file_path:
+            return False
+
         result = send_document(client, channel_id, file_path, None, text)
 
+        # Delete the encrypted file
+        if file_path != file:
+            thread(delete_file, (file_path,), pool="io")
+
         if not result:
             return ((result is not False or glovar.should_hide)
-                    or share_data_failed(client, receivers, action, action_type, data, file, encrypt))
+                    or share_data_failed(client, receivers, action, action_type, data,
+                                         None if spill else file, encrypt, digest))
 
         # Delete the tmp file
-        for f in {file, file_path}:
-            f.startswith("tmp/") and thread(delete_file, (f,))
+        if file and file.startswith("tmp/"):
+            thread(delete_file, (file,), pool="io")
+
+        # Record the digest of the uploaded data file, an unchanged file will not be uploaded again
+        if digest:
+            glovar.backup_digests[data] = digest
+            save("backup_digests")
 
         result = bool(result)
     except Exception as e:
-        logger.warning(f"Share data error: {e}", exc_info=True)
+        logger.warning(f"Share send error: {e}", exc_info=True)
 
     return result
 
 
-@threaded()
-def share_data_failed(client: Client, receivers: List[str], action: str, action_type: str,
-                      data: Union[bool, dict, int, str] = None, file: str = None, encrypt: bool = True) -> bool:
-    # Sharing data failed, use the exchange channel instead
-    result = False
+def share_work(queue: PriorityQueue) -> None:
+    # Send the data of the queue one by one, in the order of priority, text data may be packed into envelopes
+    while True:
+        items = [queue.get()]
 
-    try:
-        exchange_to_hide(client)
-        result = share_data(
-            client=client,
-            receivers=receivers,
-            action=action,
-            action_type=action_type,
-            data=data,
-            file=file,
-            encrypt=encrypt
-        )
-    except Exception as e:
-        logger.warning(f"Share data failed error: {e}", exc_info=True)
+        try:
+            _, _, _, kind, task, _ = items[0]
+            if glovar.envelope and not task[5] and kind != "hide":
+                share_envelope(queue, items)
 
-    return result
+            start = time()
+
+            if len(items) == 1:
+                share_send(*task)
+            else:
+                receivers, records = get_envelope(items)
+
+                # Never send an empty envelope, send the items one by one instead
+                if receivers and records:
+                    share_send(task[0], receivers, "envelope", "records", records)
+                else:
+                    for item in items:
+                        share_send(*item[4])
+
+            now = time()
+
+            for _, _, queued, kind, _, _ in items:
+                stats = glovar.share_stats.setdefault(kind, {"count": 0, "wait_total": 0.0, "wait_max": 0.0,
+                                                             "send_total": 0.0})
+                stats["count"] += 1
+                stats["wait_total"] += start - queued
+                stats["wait_max"] = max(stats["wait_max"], start - queued)
+                stats["send_total"] += (now - start) / len(items)
+
+            if len(items) > 1:
+                stats = glovar.share_stats.setdefault("envelope", {"count": 0, "records": 0})
+                stats["count"] += 1
+                stats["records"] += len(items)
+        except Exception as e:
+            logger.warning(f"Share work error: {e}", exc_info=True)
+        finally:
+            for _ in items:
+                queue.task_done()
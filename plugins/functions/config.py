@@ -18,1369 +18,227 @@
 
 import logging
 from copy import deepcopy
-from typing import List, Optional
+from json import dumps
+from typing import Any, List, Optional, Union
 
 from pyrogram import Client, InlineKeyboardButton, InlineKeyboardMarkup
 
 from .. import glovar
 from .channel import share_data
 from .etc import button_data, code, general_link, get_now, lang, thread
-from .file import save
-from .telegram import edit_message_text, send_message
+from .store import store_get, store_remove, store_requeue, store_update
+from .telegram import edit_message_reply_markup, edit_message_text, send_message
 
 # Enable logging
 logger = logging.getLogger(__name__)
 
+# Keyboard schema of each bot type, compiled once into row templates by compile_schema()
+#   ("default",) : default settings toggle
+#   ("toggle", path, label) : a label button and a status button, the path is "key" or "key.type"
+#   ("inline", path, ...) : one button with label and status for each path
+#   ("stepper", key, label, default, step, minimum, maximum) : a number with minus and plus buttons
+#   ("commit",) : commit button
+schemas = {
+    "captcha": [
+        ("default",),
+        ("toggle", "delete"),
+        ("toggle", "restrict"),
+        ("toggle", "ban"),
+        ("toggle", "forgive"),
+        ("toggle", "hint"),
+        ("toggle", "pass"),
+        ("toggle", "pin"),
+        ("toggle", "qns"),
+        ("commit",)
+    ],
+    "clean": [
+        ("default",),
+        ("toggle", "delete"),
+        ("toggle", "restrict"),
+        ("toggle", "friend"),
+        ("toggle", "clean"),
+        ("inline", "con", "loc", "vdn", "voi"),
+        ("inline", "ast", "aud", "bmd", "doc"),
+        ("inline", "gam", "gif", "via", "vid"),
+        ("inline", "ser", "sti", "aff", "emo"),
+        ("inline", "exe", "iml", "pho", "sho"),
+        ("inline", "tgl", "tgp", "qrc", "sde"),
+        ("inline", "tcl", "ttd"),
+        ("commit",)
+    ],
+    "lang": [
+        ("default",),
+        ("toggle", "delete"),
+        ("toggle", "restrict"),
+        ("toggle", "name.default", "name_default"),
+        ("toggle", "name.enable", "name_enable"),
+        ("toggle", "text.default", "text_default"),
+        ("toggle", "text.enable", "text_enable"),
+        ("toggle", "sticker.default", "sticker_default"),
+        ("toggle", "sticker.enable", "sticker_enable"),
+        ("toggle", "bio.default", "bio_default"),
+        ("toggle", "bio.enable", "bio_enable"),
+        ("toggle", "spc"),
+        ("toggle", "spe"),
+        ("commit",)
+    ],
+    "long": [
+        ("default",),
+        ("toggle", "delete"),
+        ("toggle", "restrict"),
+        ("stepper", "limit", "long_limit", 1500, 500, 500, 10000),
+        ("commit",)
+    ],
+    "noflood": [
+        ("default",),
+        ("toggle", "delete"),
+        ("toggle", "restrict"),
+        ("stepper", "time", "noflood_time", 10, 5, 5, 60),
+        ("stepper", "limit", "noflood_limit", 5, 1, 2, 20),
+        ("toggle", "purge", "noflood_purge"),
+        ("commit",)
+    ],
+    "noporn": [
+        ("default",),
+        ("toggle", "delete"),
+        ("toggle", "restrict"),
+        ("toggle", "channel", "noporn_channel"),
+        ("commit",)
+    ],
+    "nospam": [
+        ("default",),
+        ("toggle", "delete"),
+        ("toggle", "restrict"),
+        ("toggle", "nick"),
+        ("toggle", "bio"),
+        ("toggle", "avatar"),
+        ("toggle", "message"),
+        ("toggle", "ocr"),
+        ("toggle", "sticker"),
+        ("toggle", "bot"),
+        ("toggle", "new"),
+        # ("toggle", "deleter"),
+        # ("toggle", "reporter"),
+        # ("toggle", "scorer"),
+        # ("toggle", "ml"),
+        ("commit",)
+    ],
+    "recheck": [
+        ("default",),
+        ("toggle", "delete"),
+        ("toggle", "restrict"),
+        ("commit",)
+    ],
+    "tip": [
+        ("default",),
+        ("toggle", "captcha"),
+        ("toggle", "alone"),
+        ("toggle", "clean"),
+        ("toggle", "ot"),
+        ("toggle", "rm"),
+        ("toggle", "welcome"),
+        ("toggle", "keyword"),
+        ("toggle", "white"),
+        ("toggle", "equal"),
+        ("toggle", "cancel"),
+        ("toggle", "hold"),
+        ("toggle", "channel"),
+        ("toggle", "resend"),
+        ("commit",)
+    ],
+    "user": [
+        ("default",),
+        ("toggle", "delete"),
+        ("toggle", "gb"),
+        ("toggle", "gr"),
+        ("toggle", "gd"),
+        ("toggle", "sb"),
+        ("toggle", "sr"),
+        ("toggle", "sd"),
+        ("commit",)
+    ],
+    "warn": [
+        ("default",),
+        ("toggle", "delete"),
+        ("stepper", "limit", "warn_limit", 3, 1, 2, 5),
+        ("toggle", "mention", "warn_admin"),
+        ("toggle", "report.auto", "report_auto"),
+        ("toggle", "report.manual", "report_manual"),
+        ("commit",)
+    ]
+}
+
+
+def compile_schema(schema: List[tuple]) -> List[list]:
+    # Compile a keyboard schema into row templates, static buttons and all callback payloads are built here once
+    result = []
 
-def button_captcha(config: dict) -> Optional[InlineKeyboardMarkup]:
-    # Get inline markup for CAPTCHA
-    markup = None
-    try:
-        markup = InlineKeyboardMarkup(
-            [
-                [
-                    InlineKeyboardButton(
-                        text=lang("default_config"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('default'))}",
-                        callback_data=button_data(
-                            action=(lambda x: "default" if not x else "none")(config.get("default")),
-                            action_type=None,
-                            data=not config.get("default")
-                        )
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("delete"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('delete'))}",
-                        callback_data=button_data("delete", None, not config.get("delete"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("restrict"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('restrict'))}",
-                        callback_data=button_data("restrict", None, not config.get("restrict"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("ban"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('ban'))}",
-                        callback_data=button_data("ban", None, not config.get("ban"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("forgive"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('forgive'))}",
-                        callback_data=button_data("forgive", None, not config.get("forgive"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("hint"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('hint'))}",
-                        callback_data=button_data("hint", None, not config.get("hint"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("pass"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('pass'))}",
-                        callback_data=button_data("pass", None, not config.get("pass"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("pin"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('pin'))}",
-                        callback_data=button_data("pin", None, not config.get("pin"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("qns"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('qns'))}",
-                        callback_data=button_data("qns", None, not config.get("qns"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("commit"),
-                        callback_data=button_data("commit")
-                    )
-                ]
-            ]
-        )
-    except Exception as e:
-        logger.warning(f"Button captcha error: {e}", exc_info=True)
-
-    return markup
-
-
-def button_clean(config: dict) -> Optional[InlineKeyboardMarkup]:
-    # Get inline markup for CLEAN
-    markup = None
-    try:
-        markup = InlineKeyboardMarkup(
-            [
-                [
-                    InlineKeyboardButton(
-                        text=lang("default_config"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('default'))}",
-                        callback_data=button_data(
-                            action=(lambda x: "default" if not x else "none")(config.get("default")),
-                            action_type=None,
-                            data=not config.get("default")
-                        )
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("delete"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('delete'))}",
-                        callback_data=button_data("delete", None, not config.get("delete"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("restrict"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('restrict'))}",
-                        callback_data=button_data("restrict", None, not config.get("restrict"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("friend"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('friend'))}",
-                        callback_data=button_data("friend", None, not config.get("friend"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("clean"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('clean'))}",
-                        callback_data=button_data("clean", None, not config.get("clean"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=f"{lang('con')} {(lambda x: '■' if x else '□️')(config.get('con'))}",
-                        callback_data=button_data("con", None, not config.get("con"))
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{lang('loc')} {(lambda x: '■' if x else '□️')(config.get('loc'))}",
-                        callback_data=button_data("loc", None, not config.get("loc"))
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{lang('vdn')} {(lambda x: '■' if x else '□️')(config.get('vdn'))}",
-                        callback_data=button_data("vdn", None, not config.get("vdn"))
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{lang('voi')} {(lambda x: '■' if x else '□️')(config.get('voi'))}",
-                        callback_data=button_data("voi", None, not config.get("voi"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=f"{lang('ast')} {(lambda x: '■' if x else '□️')(config.get('ast'))}",
-                        callback_data=button_data("ast", None, not config.get("ast"))
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{lang('aud')} {(lambda x: '■' if x else '□️')(config.get('aud'))}",
-                        callback_data=button_data("aud", None, not config.get("aud"))
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{lang('bmd')} {(lambda x: '■' if x else '□️')(config.get('bmd'))}",
-                        callback_data=button_data("bmd", None, not config.get("bmd"))
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{lang('doc')} {(lambda x: '■' if x else '□️')(config.get('doc'))}",
-                        callback_data=button_data("doc", None, not config.get("doc"))
-                    )
-                ],
-                [
-
-
-                    InlineKeyboardButton(
-                        text=f"{lang('gam')} {(lambda x: '■' if x else '□️')(config.get('gam'))}",
-                        callback_data=button_data("gam", None, not config.get("gam"))
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{lang('gif')} {(lambda x: '■' if x else '□️')(config.get('gif'))}",
-                        callback_data=button_data("gif", None, not config.get("gif"))
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{lang('via')} {(lambda x: '■' if x else '□️')(config.get('via'))}",
-                        callback_data=button_data("via", None, not config.get("via"))
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{lang('vid')} {(lambda x: '■' if x else '□️')(config.get('vid'))}",
-                        callback_data=button_data("vid", None, not config.get("vid"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=f"{lang('ser')} {(lambda x: '■' if x else '□️')(config.get('ser'))}",
-                        callback_data=button_data("ser", None, not config.get("ser"))
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{lang('sti')} {(lambda x: '■' if x else '□️')(config.get('sti'))}",
-                        callback_data=button_data("sti", None, not config.get("sti"))
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{lang('aff')} {(lambda x: '■' if x else '□️')(config.get('aff'))}",
-                        callback_data=button_data("aff", None, not config.get("aff"))
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{lang('emo')} {(lambda x: '■' if x else '□️')(config.get('emo'))}",
-                        callback_data=button_data("emo", None, not config.get("emo"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=f"{lang('exe')} {(lambda x: '■' if x else '□️')(config.get('exe'))}",
-                        callback_data=button_data("exe", None, not config.get("exe"))
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{lang('iml')} {(lambda x: '■' if x else '□️')(config.get('iml'))}",
-                        callback_data=button_data("iml", None, not config.get("iml"))
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{lang('pho')} {(lambda x: '■' if x else '□️')(config.get('pho'))}",
-                        callback_data=button_data("pho", None, not config.get("pho"))
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{lang('sho')} {(lambda x: '■' if x else '□️')(config.get('sho'))}",
-                        callback_data=button_data("sho", None, not config.get("sho"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=f"{lang('tgl')} {(lambda x: '■' if x else '□️')(config.get('tgl'))}",
-                        callback_data=button_data("tgl", None, not config.get("tgl"))
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{lang('tgp')} {(lambda x: '■' if x else '□️')(config.get('tgp'))}",
-                        callback_data=button_data("tgp", None, not config.get("tgp"))
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{lang('qrc')} {(lambda x: '■' if x else '□️')(config.get('qrc'))}",
-                        callback_data=button_data("qrc", None, not config.get("qrc"))
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{lang('sde')} {(lambda x: '■' if x else '□️')(config.get('sde'))}",
-                        callback_data=button_data("sde", None, not config.get("sde"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=f"{lang('tcl')} {(lambda x: '■' if x else '□️')(config.get('tcl'))}",
-                        callback_data=button_data("tcl", None, not config.get("tcl"))
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{lang('ttd')} {(lambda x: '■' if x else '□️')(config.get('ttd'))}",
-                        callback_data=button_data("ttd", None, not config.get("ttd"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("commit"),
-                        callback_data=button_data("commit")
-                    )
-                ]
-            ]
-        )
-    except Exception as e:
-        logger.warning(f"Button clean error: {e}", exc_info=True)
-
-    return markup
-
-
-def button_lang(config: dict) -> Optional[InlineKeyboardMarkup]:
-    # Get inline markup for LANG
-    markup = None
     try:
-        name_default = config.get("name") and config["name"].get("default")
-        name_enable = config.get("name") and config["name"].get("enable")
-        text_default = config.get("text") and config["text"].get("default")
-        text_enable = config.get("text") and config["text"].get("enable")
-        sticker_default = config.get("sticker") and config["sticker"].get("default")
-        sticker_enable = config.get("sticker") and config["sticker"].get("enable")
-        bio_default = config.get("bio") and config["bio"].get("default")
-        bio_enable = config.get("bio") and config["bio"].get("enable")
-        markup = InlineKeyboardMarkup(
-            [
-                [
-                    InlineKeyboardButton(
-                        text=lang("default_config"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('default'))}",
-                        callback_data=button_data(
-                            action=(lambda x: "default" if not x else "none")(config.get("default")),
-                            action_type=None,
-                            data=not config.get("default")
-                        )
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("delete"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('delete'))}",
-                        callback_data=button_data("delete", None, not config.get("delete"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("restrict"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('restrict'))}",
-                        callback_data=button_data("restrict", None, not config.get("restrict"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("name_default"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(name_default)}",
-                        callback_data=button_data("name", "default", name_default)
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("name_enable"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(name_enable)}",
-                        callback_data=button_data("name", "enable", not name_enable)
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("text_default"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(text_default)}",
-                        callback_data=button_data("text", "default", not text_default)
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("text_enable"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(text_enable)}",
-                        callback_data=button_data("text", "enable", not text_enable)
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("sticker_default"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(sticker_default)}",
-                        callback_data=button_data("sticker", "default", not sticker_default)
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("sticker_enable"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(sticker_enable)}",
-                        callback_data=button_data("sticker", "enable", not sticker_enable)
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("bio_default"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(bio_default)}",
-                        callback_data=button_data("bio", "default", not bio_default)
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("bio_enable"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(bio_enable)}",
-                        callback_data=button_data("bio", "enable", not bio_enable)
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("spc"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('spc'))}",
-                        callback_data=button_data("spc", None, not config.get("spc"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("spe"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('spe'))}",
-                        callback_data=button_data("spe", None, not config.get("spe"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("commit"),
-                        callback_data=button_data("commit")
-                    )
-                ]
-            ]
-        )
+        label_none = get_payload("none")
+
+        for row in schema:
+            kind = row[0]
+
+            if kind == "default":
+                payloads = {status: get_payload("none" if status else "default", None, not status)
+                            for status in (True, False)}
+                result.append([InlineKeyboardButton(text=lang("default_config"), callback_data=label_none),
+                               ("default", payloads)])
+            elif kind == "toggle":
+                path = row[1]
+                label = row[2] if len(row) > 2 else path
+                action, _, action_type = path.partition(".")
+                payloads = {status: get_payload(action, action_type or None, not status) for status in (True, False)}
+                result.append([InlineKeyboardButton(text=lang(label), callback_data=label_none),
+                               ("toggle", action, action_type or None, payloads)])
+            elif kind == "inline":
+                result.append([("inline", path, None, {status: get_payload(path, None, not status)
+                                                       for status in (True, False)}, lang(path))
+                               for path in row[1:]])
+            elif kind == "stepper":
+                _, key, label, default, step, minimum, maximum = row
+                values = range(minimum, maximum + 1, step)
+                minus = {value: get_payload(key if value > minimum else "none", None, value - step)
+                         for value in values}
+                plus = {value: get_payload(key if value < maximum else "none", None, value + step)
+                        for value in values}
+                result.append([InlineKeyboardButton(text=lang(label), callback_data=label_none),
+                               ("value", key, default, label_none),
+                               ("minus", key, default, step, minimum, minus),
+                               ("plus", key, default, step, maximum, plus)])
+            elif kind == "commit":
+                result.append([InlineKeyboardButton(text=lang("commit"), callback_data=get_payload("commit"))])
     except Exception as e:
-        logger.warning(f"Button lang error: {e}", exc_info=True)
-
-    return markup
-
-
-def button_long(config: dict) -> Optional[InlineKeyboardMarkup]:
-    # Get inline markup for LONG
-    markup = None
-    try:
-        markup = InlineKeyboardMarkup(
-            [
-                [
-                    InlineKeyboardButton(
-                        text=lang("default_config"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('default'))}",
-                        callback_data=button_data(
-                            action=(lambda x: "default" if not x else "none")(config.get("default")),
-                            action_type=None,
-                            data=not config.get("default")
-                        )
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("delete"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('delete'))}",
-                        callback_data=button_data("delete", None, not config.get("delete"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("restrict"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('restrict'))}",
-                        callback_data=button_data("restrict", None, not config.get("restrict"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("long_limit"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{config.get('limit', 1500)}",
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '-️' if x > 500 else '*')(config.get('limit', 1500))}",
-                        callback_data=button_data(
-                            action=(lambda x: "limit" if x > 500 else "none")(config.get("limit", 1500)),
-                            action_type=None,
-                            data=config.get("limit", 1500) - 500
-                        )
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '+️' if x < 10000 else '*')(config.get('limit', 1500))}",
-                        callback_data=button_data(
-                            action=(lambda x: "limit" if x < 10000 else "none")(config.get("limit", 1500)),
-                            action_type=None,
-                            data=config.get("limit", 1500) + 500
-                        )
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("commit"),
-                        callback_data=button_data("commit")
-                    )
-                ]
-            ]
-        )
-    except Exception as e:
-        logger.warning(f"Button long error: {e}", exc_info=True)
-
-    return markup
-
-
-def button_noflood(config: dict) -> Optional[InlineKeyboardMarkup]:
-    # Get inline markup for NOFLOOD
-    markup = None
-    try:
-        markup = InlineKeyboardMarkup(
-            [
-                [
-                    InlineKeyboardButton(
-                        text=lang("default_config"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('default'))}",
-                        callback_data=button_data(
-                            action=(lambda x: "default" if not x else "none")(config.get("default")),
-                            action_type=None,
-                            data=not config.get("default")
-                        )
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("delete"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('delete'))}",
-                        callback_data=button_data("delete", None, not config.get("delete"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("restrict"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('restrict'))}",
-                        callback_data=button_data("restrict", None, not config.get("restrict"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("noflood_time"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{config.get('time', 10)}",
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '-️' if x > 5 else '*')(config.get('time', 10))}",
-                        callback_data=button_data(
-                            action=(lambda x: "time" if x > 5 else "none")(config.get("time", 10)),
-                            action_type=None,
-                            data=config.get("time", 10) - 5
-                        )
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '+️' if x < 60 else '*')(config.get('time', 10))}",
-                        callback_data=button_data(
-                            action=(lambda x: "time" if x < 60 else "none")(config.get("time", 10)),
-                            action_type=None,
-                            data=config.get("time", 10) + 5
-                        )
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("noflood_limit"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{config.get('limit', 5)}",
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '-️' if x > 2 else '*')(config.get('limit', 5))}",
-                        callback_data=button_data(
-                            action=(lambda x: "limit" if x > 2 else "none")(config.get("limit", 5)),
-                            action_type=None,
-                            data=config.get("limit", 5) - 1
-                        )
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '+️' if x < 20 else '*')(config.get('limit', 5))}",
-                        callback_data=button_data(
-                            action=(lambda x: "limit" if x < 20 else "none")(config.get("limit", 5)),
-                            action_type=None,
-                            data=config.get("limit", 5) + 1
-                        )
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("noflood_purge"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('purge'))}",
-                        callback_data=button_data("purge", None, not config.get("purge"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("commit"),
-                        callback_data=button_data("commit")
-                    )
-                ]
-            ]
-        )
-    except Exception as e:
-        logger.warning(f"Button noflood error: {e}", exc_info=True)
-
-    return markup
-
-
-def button_noporn(config: dict) -> Optional[InlineKeyboardMarkup]:
-    # Get inline markup for NOPORN
-    markup = None
-    try:
-        markup = InlineKeyboardMarkup(
-            [
-                [
-                    InlineKeyboardButton(
-                        text=lang("default_config"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('default'))}",
-                        callback_data=button_data(
-                            action=(lambda x: "default" if not x else "none")(config.get("default")),
-                            action_type=None,
-                            data=not config.get("default")
-                        )
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("delete"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('delete'))}",
-                        callback_data=button_data("delete", None, not config.get("delete"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("restrict"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('restrict'))}",
-                        callback_data=button_data("restrict", None, not config.get("restrict"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("noporn_channel"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('channel'))}",
-                        callback_data=button_data("channel", None, not config.get("channel"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("commit"),
-                        callback_data=button_data("commit")
-                    )
-                ]
-            ]
-        )
-    except Exception as e:
-        logger.warning(f"Button noporn error: {e}", exc_info=True)
-
-    return markup
-
-
-def button_nospam(config: dict) -> Optional[InlineKeyboardMarkup]:
-    # Get inline markup for NOSPAM
-    markup = None
-    try:
-        markup = InlineKeyboardMarkup(
-            [
-                [
-                    InlineKeyboardButton(
-                        text=lang("default_config"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('default'))}",
-                        callback_data=button_data(
-                            action=(lambda x: "default" if not x else "none")(config.get("default")),
-                            action_type=None,
-                            data=not config.get("default")
-                        )
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("delete"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('delete'))}",
-                        callback_data=button_data("delete", None, not config.get("delete"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("restrict"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('restrict'))}",
-                        callback_data=button_data("restrict", None, not config.get("restrict"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("nick"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('nick'))}",
-                        callback_data=button_data("nick", None, not config.get("nick"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("bio"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('bio'))}",
-                        callback_data=button_data("bio", None, not config.get("bio"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("avatar"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('avatar'))}",
-                        callback_data=button_data("avatar", None, not config.get("avatar"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("message"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('message'))}",
-                        callback_data=button_data("message", None, not config.get("message"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("ocr"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('ocr'))}",
-                        callback_data=button_data("ocr", None, not config.get("ocr"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("sticker"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('sticker'))}",
-                        callback_data=button_data("sticker", None, not config.get("sticker"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("bot"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('bot'))}",
-                        callback_data=button_data("bot", None, not config.get("bot"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("new"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('new'))}",
-                        callback_data=button_data("new", None, not config.get("new"))
-                    )
-                ],
-                # [
-                #     InlineKeyboardButton(
-                #         text=lang("deleter"),
-                #         callback_data=button_data("none")
-                #     ),
-                #     InlineKeyboardButton(
-                #         text=f"{(lambda x: '■' if x else '□️')(config.get('deleter'))}",
-                #         callback_data=button_data("deleter", None, not config.get("deleter"))
-                #     )
-                # ],
-                # [
-                #     InlineKeyboardButton(
-                #         text=lang("reporter"),
-                #         callback_data=button_data("none")
-                #     ),
-                #     InlineKeyboardButton(
-                #         text=f"{(lambda x: '■' if x else '□️')(config.get('reporter'))}",
-                #         callback_data=button_data("reporter", None, not config.get("reporter"))
-                #     )
-                # ],
-                # [
-                #     InlineKeyboardButton(
-                #         text=lang("scorer"),
-                #         callback_data=button_data("none")
-                #     ),
-                #     InlineKeyboardButton(
-                #         text=f"{(lambda x: '■' if x else '□️')(config.get('scorer'))}",
-                #         callback_data=button_data("scorer", None, not config.get("scorer"))
-                #     )
-                # ],
-                # [
-                #     InlineKeyboardButton(
-                #         text=lang("ml"),
-                #         callback_data=button_data("none")
-                #     ),
-                #     InlineKeyboardButton(
-                #         text=f"{(lambda x: '■' if x else '□️')(config.get('ml'))}",
-                #         callback_data=button_data("ml", None, not config.get("ml"))
-                #     )
-                # ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("commit"),
-                        callback_data=button_data("commit")
-                    )
-                ]
-            ]
-        )
-    except Exception as e:
-        logger.warning(f"Button nospam error: {e}", exc_info=True)
-
-    return markup
-
-
-def button_recheck(config: dict) -> Optional[InlineKeyboardMarkup]:
-    # Get inline markup for RECHECK
-    markup = None
-    try:
-        markup = InlineKeyboardMarkup(
-            [
-                [
-                    InlineKeyboardButton(
-                        text=lang("default_config"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('default'))}",
-                        callback_data=button_data(
-                            action=(lambda x: "default" if not x else "none")(config.get("default")),
-                            action_type=None,
-                            data=not config.get("default")
-                        )
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("delete"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('delete'))}",
-                        callback_data=button_data("delete", None, not config.get("delete"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("restrict"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('restrict'))}",
-                        callback_data=button_data("restrict", None, not config.get("restrict"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("commit"),
-                        callback_data=button_data("commit")
-                    )
-                ]
-            ]
-        )
-    except Exception as e:
-        logger.warning(f"Button recheck error: {e}", exc_info=True)
-
-    return markup
-
-
-def button_tip(config: dict) -> Optional[InlineKeyboardMarkup]:
-    # Get inline markup for TIP
-    markup = None
-    try:
-        markup = InlineKeyboardMarkup(
-            [
-                [
-                    InlineKeyboardButton(
-                        text=lang("default_config"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('default'))}",
-                        callback_data=button_data(
-                            action=(lambda x: "default" if not x else "none")(config.get("default")),
-                            action_type=None,
-                            data=not config.get("default")
-                        )
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("captcha"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('captcha'))}",
-                        callback_data=button_data("captcha", None, not config.get("captcha"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("alone"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('alone'))}",
-                        callback_data=button_data("alone", None, not config.get("alone"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("clean"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('clean'))}",
-                        callback_data=button_data("clean", None, not config.get("clean"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("ot"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('ot'))}",
-                        callback_data=button_data("ot", None, not config.get("ot"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("rm"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('rm'))}",
-                        callback_data=button_data("rm", None, not config.get("rm"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("welcome"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('welcome'))}",
-                        callback_data=button_data("welcome", None, not config.get("welcome"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("keyword"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('keyword'))}",
-                        callback_data=button_data("keyword", None, not config.get("keyword"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("white"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('white'))}",
-                        callback_data=button_data("white", None, not config.get("white"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("equal"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('equal'))}",
-                        callback_data=button_data("equal", None, not config.get("equal"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("cancel"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('cancel'))}",
-                        callback_data=button_data("cancel", None, not config.get("cancel"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("hold"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('hold'))}",
-                        callback_data=button_data("hold", None, not config.get("hold"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("channel"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('channel'))}",
-                        callback_data=button_data("channel", None, not config.get("channel"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("resend"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('resend'))}",
-                        callback_data=button_data("resend", None, not config.get("resend"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("commit"),
-                        callback_data=button_data("commit")
-                    )
-                ]
-            ]
-        )
-    except Exception as e:
-        logger.warning(f"Button tip error: {e}", exc_info=True)
-
-    return markup
-
-
-def button_user(config: dict) -> Optional[InlineKeyboardMarkup]:
-    # Get inline markup for USER
-    markup = None
-    try:
-        markup = InlineKeyboardMarkup(
-            [
-                [
-                    InlineKeyboardButton(
-                        text=lang("default_config"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('default'))}",
-                        callback_data=button_data(
-                            action=(lambda x: "default" if not x else "none")(config.get("default")),
-                            action_type=None,
-                            data=not config.get("default")
-                        )
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("delete"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('delete'))}",
-                        callback_data=button_data("delete", None, not config.get("delete"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("gb"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('gb'))}",
-                        callback_data=button_data("gb", None, not config.get("gb"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("gr"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('gr'))}",
-                        callback_data=button_data("gr", None, not config.get("gr"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("gd"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('gd'))}",
-                        callback_data=button_data("gd", None, not config.get("gd"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("sb"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('sb'))}",
-                        callback_data=button_data("sb", None, not config.get("sb"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("sr"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('sr'))}",
-                        callback_data=button_data("sr", None, not config.get("sr"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("sd"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('sd'))}",
-                        callback_data=button_data("sd", None, not config.get("sd"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("commit"),
-                        callback_data=button_data("commit")
-                    )
-                ]
-            ]
-        )
-    except Exception as e:
-        logger.warning(f"Button user error: {e}", exc_info=True)
-
-    return markup
-
+        logger.warning(f"Compile schema error: {e}", exc_info=True)
 
-def button_warn(config: dict) -> Optional[InlineKeyboardMarkup]:
-    # Get inline markup for WARN
-    markup = None
-    try:
-        report_auto = config.get("report") and config["report"].get("auto")
-        report_manual = config.get("report") and config["report"].get("manual")
-        markup = InlineKeyboardMarkup(
-            [
-                [
-                    InlineKeyboardButton(
-                        text=lang("default_config"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('default'))}",
-                        callback_data=button_data(
-                            action=(lambda x: "default" if not x else "none")(config.get("default")),
-                            action_type=None,
-                            data=not config.get("default")
-                        )
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("delete"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('delete'))}",
-                        callback_data=button_data("delete", None, not config.get("delete"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("warn_limit"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{config.get('limit', 3)}",
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '-️' if x > 2 else '*')(config.get('limit', 3))}",
-                        callback_data=button_data(
-                            action=(lambda x: "limit" if x > 2 else "none")(config.get("limit", 3)),
-                            action_type=None,
-                            data=config.get("limit", 3) - 1
-                        )
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '+️' if x < 5 else '*')(config.get('limit', 3))}",
-                        callback_data=button_data(
-                            action=(lambda x: "limit" if x < 5 else "none")(config.get("limit", 3)),
-                            action_type=None,
-                            data=config.get("limit", 3) + 1
-                        )
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("warn_admin"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(config.get('mention'))}",
-                        callback_data=button_data("mention", None, not config.get("mention"))
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("report_auto"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(report_auto)}",
-                        callback_data=button_data("report", "auto", not report_auto)
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("report_manual"),
-                        callback_data=button_data("none")
-                    ),
-                    InlineKeyboardButton(
-                        text=f"{(lambda x: '■' if x else '□️')(report_manual)}",
-                        callback_data=button_data("report", "manual", not report_manual)
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text=lang("commit"),
-                        callback_data=button_data("commit")
-                    )
-                ]
-            ]
-        )
-    except Exception as e:
-        logger.warning(f"Button warn error: {e}", exc_info=True)
-
-    return markup
+    return result
 
 
 def commit_change(client: Client, key: str) -> bool:
     # Commit the new configuration
     try:
-        if not glovar.configs.get(key):
+        session = store_get(key)
+
+        if not session:
             return True
 
         # Change commit status
-        glovar.configs[key]["commit"] = True
+        session["commit"] = True
+        store_update(key, session, "commit")
 
         # Use config type to get the right receiver
-        config_type = glovar.configs[key]["type"]
-        group_id = glovar.configs[key]["group_id"]
+        config_type = session["type"]
+        group_id = session["group_id"]
 
         # The config session message id
-        message_id = glovar.configs[key]["message_id"]
-        config_data = glovar.configs[key]["config"]
+        message_id = session["message_id"]
+        config_data = session["config"]
 
         # Edit config session message
-        text = get_config_text(key)
+        text = get_config_text(key, session)
         text += f"{lang('status')}{lang('colon')}{code(lang('committed'))}\n"
         thread(edit_message_text, (client, glovar.config_channel_id, message_id, text))
+        glovar.markup_sent.pop(message_id, None)
 
         # Commit changes to exchange channel
         receivers = [config_type.upper()]
@@ -1396,9 +254,9 @@ def commit_change(client: Client, key: str) -> bool:
         )
 
         # Send debug message
-        group_name = glovar.configs[key]["group_name"]
-        group_link = glovar.configs[key]["group_link"]
-        user_id = glovar.configs[key]["user_id"]
+        group_name = session["group_name"]
+        group_link = session["group_link"]
+        user_id = session["user_id"]
         debug_text = (f"{lang('project')}{lang('colon')}{general_link(glovar.project_name, glovar.project_link)}\n"
                       f"{lang('group_name')}{lang('colon')}{general_link(group_name, group_link)}\n"
                       f"{lang('group_id')}{lang('colon')}{code(group_id)}\n"
@@ -1435,20 +293,20 @@ def conflict_config(config: dict, config_list: List[str], master: str) -> dict:
     return result
 
 
-def get_config_message(key: str) -> (str, Optional[InlineKeyboardMarkup]):
+def get_config_message(key: str, session: dict) -> (str, Optional[InlineKeyboardMarkup]):
     # Get a config session message (text + reply markup)
     text = ""
     markup = None
     try:
-        if not glovar.configs.get(key):
+        if not session:
             return "", None
 
-        config_type = glovar.configs[key]["type"]
-        config_data = glovar.configs[key]["config"]
+        config_type = session["type"]
+        config_data = session["config"]
 
-        # For each config type, use different function to generate reply markup buttons
-        markup = eval(f"button_{config_type}")(config_data)
-        text = get_config_text(key)
+        # For each config type, fill in the compiled keyboard
+        markup = get_markup(config_type, config_data)
+        text = get_config_text(key, session)
         text += (f"{lang('description')}{lang('colon')}{code(lang('config_description'))}\n"
                  f"{lang('button_enabled')}{lang('colon')}■\n"
                  f"{lang('button_disabled')}{lang('colon')}□\n")
@@ -1458,18 +316,82 @@ def get_config_message(key: str) -> (str, Optional[InlineKeyboardMarkup]):
     return text, markup
 
 
-def get_config_text(key: str) -> str:
+def edit_config_markup(client: Client, cid: int, mid: int, session: dict) -> bool:
+    # Edit the config session message's reply markup, skip it if the markup is not changed
+    result = False
+
+    try:
+        fingerprint = get_fingerprint(session)
+
+        if glovar.markup_sent.get(mid) == fingerprint:
+            glovar.markup_stats["suppressed"] += 1
+            return True
+
+        markup = get_markup(session["type"], session["config"])
+        result = edit_message_reply_markup(client, cid, mid, markup)
+
+        if result:
+            glovar.markup_sent[mid] = fingerprint
+
+        result = bool(result)
+    except Exception as e:
+        logger.warning(f"Edit config markup error: {e}", exc_info=True)
+
+    return result
+
+
+def get_button(cell: Union[InlineKeyboardButton, tuple], config: dict) -> InlineKeyboardButton:
+    # Fill in the variable part of a compiled button
+    if isinstance(cell, InlineKeyboardButton):
+        return cell
+
+    kind = cell[0]
+    value = get_value(cell, config)
+
+    if kind == "default":
+        return InlineKeyboardButton(text=get_symbol(value), callback_data=cell[1][bool(value)])
+
+    if kind in {"toggle", "inline"}:
+        text = get_symbol(value)
+
+        if kind == "inline":
+            text = f"{cell[4]} {text}"
+
+        return InlineKeyboardButton(text=text, callback_data=cell[3][bool(value)])
+
+    key = cell[1]
+
+    if kind == "value":
+        return InlineKeyboardButton(text=f"{value}", callback_data=cell[3])
+
+    step, bound, payloads = cell[3], cell[4], cell[5]
+
+    # Values out of the precomputed range are encoded on the fly
+    if kind == "minus":
+        return InlineKeyboardButton(
+            text="-️" if value > bound else "*",
+            callback_data=(payloads.get(value)
+                           or button_data(key if value > bound else "none", None, value - step))
+        )
+
+    return InlineKeyboardButton(
+        text="+️" if value < bound else "*",
+        callback_data=payloads.get(value) or button_data(key if value < bound else "none", None, value + step)
+    )
+
+
+def get_config_text(key: str, session: dict) -> str:
     # Get a config session message text prefix
     text = ""
     try:
-        project_name = glovar.configs[key]["project_name"]
-        project_link = glovar.configs[key]["project_link"]
+        project_name = session["project_name"]
+        project_link = session["project_link"]
 
-        group_id = glovar.configs[key]["group_id"]
-        group_name = glovar.configs[key]["group_name"]
-        group_link = glovar.configs[key]["group_link"]
+        group_id = session["group_id"]
+        group_name = session["group_name"]
+        group_link = session["group_link"]
 
-        user_id = glovar.configs[key]["user_id"]
+        user_id = session["user_id"]
 
         text = (f"{lang('config_code')}{lang('colon')}{code(key)}\n"
                 f"{lang('project')}{lang('colon')}{general_link(project_name, project_link)}\n"
@@ -1482,25 +404,123 @@ def get_config_text(key: str) -> str:
     return text
 
 
-def remove_old(client: Client, key: str) -> bool:
-    # Remove old config session data
+def get_fingerprint(session: dict) -> str:
+    # Get the fingerprint of a config session's reply markup
+    return f"{session['type']}:{get_state(session['type'], session['config'])}"
+
+
+def get_markup(config_type: str, config: dict) -> Optional[InlineKeyboardMarkup]:
+    # Get inline markup of the bot type from the cache or the compiled keyboard
+    markup = None
+
     try:
-        if not glovar.configs.get(key):
-            return True
+        key = (config_type, (glovar.zh_cn and "zh_cn") or "en", get_state(config_type, config))
 
-        if glovar.configs[key]["lock"]:
-            return True
+        with glovar.locks["markup"]:
+            markup = glovar.markup_cache.get(key)
+
+            if markup:
+                glovar.markup_cache.move_to_end(key)
+                glovar.markup_stats["hit"] += 1
+                return markup
+
+            glovar.markup_stats["miss"] += 1
+
+        markup = InlineKeyboardMarkup([[get_button(cell, config) for cell in row] for row in keyboards[config_type]])
+
+        with glovar.locks["markup"]:
+            glovar.markup_cache[key] = markup
+
+            while len(glovar.markup_cache) > glovar.markup_limit:
+                glovar.markup_cache.popitem(last=False)
+    except Exception as e:
+        logger.warning(f"Get markup error: {e}", exc_info=True)
+
+    return markup
+
+
+def get_payload(action: str, action_type: str = None, data: Union[bool, int] = None) -> bytes:
+    # Get a button's callback payload, remember it for decoding
+    result = button_data(action, action_type, data)
+
+    # The none and commit buttons share one payload each, they carry no data
+    if action in {"none", "commit"}:
+        glovar.button_parsed[result.decode("utf-8")] = (action, None, None)
+    else:
+        glovar.button_parsed[result.decode("utf-8")] = (action, action_type, data)
+
+    return result
+
+
+def get_state(config_type: str, config: dict) -> str:
+    # Get the canonical string of the config values read by the keyboard, other fields such as lock are left out
+    values = []
+
+    for row in keyboards[config_type]:
+        for cell in row:
+            if isinstance(cell, InlineKeyboardButton) or cell[0] in {"minus", "plus"}:
+                continue
+
+            value = get_value(cell, config)
+            values.append(value if cell[0] == "value" else bool(value))
+
+    return dumps(values, separators=(",", ":"))
 
-        if not glovar.configs[key]["commit"]:
-            # If it is not committed, edit the session message to update the status (invalid)
-            text = get_config_text(key)
-            text += f"{lang('status')}{lang('colon')}{code(lang('expired'))}\n"
-            mid = glovar.configs[key]["message_id"]
-            thread(edit_message_text, (client, glovar.config_channel_id, mid, text))
 
-        # Pop this config data
-        glovar.configs.pop(key, {})
-        save("configs")
+def get_symbol(value: Any) -> str:
+    # Get the status symbol
+    return (value and "■") or "□️"
+
+
+def get_value(cell: tuple, config: dict) -> Any:
+    # Get the config value shown by a compiled button
+    kind = cell[0]
+
+    if kind == "default":
+        return config.get("default")
+
+    if kind in {"toggle", "inline"}:
+        action, action_type = cell[1], cell[2]
+        return config.get(action) and config[action].get(action_type) if action_type else config.get(action)
+
+    return config.get(cell[1], cell[2])
+
+
+def remove_old(client: Client, keys: List[str], before: int = None) -> bool:
+    # Remove old config sessions data, with the time, only the sessions created before it are removed
+    try:
+        removed = []
+
+        for key in keys:
+            session = store_get(key)
+
+            if not session:
+                continue
+
+            # The session was reused by a new ask, it has a new expiry
+            if before is not None and session["time"] > before:
+                continue
+
+            # It is being changed by a callback, check it again in the next round
+            if session["lock"]:
+                if before is not None:
+                    store_requeue(key, session)
+
+                continue
+
+            mid = session.get("message_id")
+
+            if mid and not session["commit"]:
+                # If it is not committed, edit the session message to update the status (invalid)
+                text = get_config_text(key, session)
+                text += f"{lang('status')}{lang('colon')}{code(lang('expired'))}\n"
+                thread(edit_message_text, (client, glovar.config_channel_id, mid, text))
+
+            glovar.markup_sent.pop(mid, None)
+            removed.append(key)
+
+        # Pop these config data in one transaction
+        store_remove(removed)
 
         return True
     except Exception as e:
@@ -1509,15 +529,18 @@ def remove_old(client: Client, key: str) -> bool:
     return False
 
 
-def set_default(key: str) -> bool:
+def set_default(session: dict) -> bool:
     # Set the config to the default one
     try:
-        glovar.configs[key]["config"] = deepcopy(glovar.configs[key]["default"])
-        glovar.configs[key]["config"]["lock"] = get_now()
-        save("configs")
+        session["config"] = deepcopy(session["default"])
+        session["config"]["lock"] = get_now()
 
         return True
     except Exception as e:
         logger.warning(f"Set default error: {e}", exc_info=True)
 
     return False
+
+
+# Compile the keyboards once
+keyboards = {config_type: compile_schema(schemas[config_type]) for config_type in schemas}
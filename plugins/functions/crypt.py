@@ -0,0 +1,221 @@
+# SCP-079-CONFIG - Manage the settings of each bot
+# Copyright (C) 2019-2020 SCP-079 <https://scp-079.org>
+#
+# This file is part of SCP-079-CONFIG.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+from hashlib import sha256
+from hmac import compare_digest, new as new_hmac
+from os import urandom
+from typing import BinaryIO, Tuple
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from pyAesCrypt import decryptStream, encryptStream
+
+from .. import glovar
+
+# Enable logging
+logger = logging.getLogger(__name__)
+
+# The AES Crypt file format, version 2, see https://www.aescrypt.com/aes_file_format.html
+created_by: bytes = b"CREATED_BY\x00SCP-079-CONFIG"
+
+header: bytes = (b"AES\x02\x00"
+                 + len(created_by).to_bytes(2, "big") + created_by
+                 + b"\x00\x80" + bytes(128)
+                 + b"\x00\x00")
+
+
+def aes_decrypt(f_in: BinaryIO, f_out: BinaryIO, password: str, buffer: int, size: int) -> None:
+    # Decrypt an AES Crypt stream of the given size, raise ValueError if it is corrupted
+    iv_key, remaining = aes_header(f_in, password, size)
+    decryptor = Cipher(algorithms.AES(iv_key[16:]), modes.CBC(iv_key[:16]), backend=default_backend()).decryptor()
+    mac = new_hmac(iv_key[16:], digestmod=sha256)
+
+    # Keep the last block until the padding is known
+    last = b""
+
+    while remaining > 0:
+        data = f_in.read(min(buffer, remaining))
+
+        if not data:
+            raise ValueError("File is corrupted.")
+
+        remaining -= len(data)
+        mac.update(data)
+        text = last + decryptor.update(data)
+        last = text[-16:]
+        f_out.write(text[:-16])
+
+    last += decryptor.finalize()
+    modulo, mac_inner = aes_tail(f_in)
+    padding = (16 - modulo) % 16
+    f_out.write(last[:len(last) - padding])
+
+    if not compare_digest(mac_inner, mac.digest()):
+        raise ValueError("Bad HMAC (file is corrupted).")
+
+
+def aes_header(f_in: BinaryIO, password: str, size: int) -> Tuple[bytes, int]:
+    # Read the header of an AES Crypt stream, get the inner iv and key, and the length of the ciphertext
+    if f_in.read(3) != b"AES" or size < 136:
+        raise ValueError("File is corrupted or not an AES Crypt file.")
+
+    if f_in.read(1) != b"\x02":
+        raise ValueError("Only version 2 of the AES Crypt file format is supported.")
+
+    f_in.read(1)
+    position = 5
+
+    # Skip the extensions
+    while True:
+        length = f_in.read(2)
+        position += 2
+
+        if len(length) != 2:
+            raise ValueError("File is corrupted.")
+
+        if length == b"\x00\x00":
+            break
+
+        length = int.from_bytes(length, "big")
+        f_in.read(length)
+        position += length
+
+    iv_outer = f_in.read(16)
+    iv_key_encrypted = f_in.read(48)
+    mac_outer = f_in.read(32)
+    position += 96
+
+    if len(mac_outer) != 32:
+        raise ValueError("File is corrupted.")
+
+    key = aes_stretch(password, iv_outer)
+
+    if not compare_digest(mac_outer, new_hmac(key, iv_key_encrypted, sha256).digest()):
+        raise ValueError("Wrong password (or file is corrupted).")
+
+    decryptor = Cipher(algorithms.AES(key), modes.CBC(iv_outer), backend=default_backend()).decryptor()
+    iv_key = decryptor.update(iv_key_encrypted) + decryptor.finalize()
+    remaining = size - position - 33
+
+    if remaining < 0 or remaining % 16:
+        raise ValueError("File is corrupted.")
+
+    return iv_key, remaining
+
+
+def aes_tail(f_in: BinaryIO) -> Tuple[int, bytes]:
+    # Read the tail of an AES Crypt stream, get the file size modulo 16 and the HMAC of the ciphertext
+    modulo = f_in.read(1)
+    mac_inner = f_in.read(32)
+
+    if len(modulo) != 1 or len(mac_inner) != 32:
+        raise ValueError("File is corrupted.")
+
+    return modulo[0], mac_inner
+
+
+def aes_encrypt(f_in: BinaryIO, f_out: BinaryIO, password: str, buffer: int) -> None:
+    # Encrypt a stream to the AES Crypt format
+    iv_outer = urandom(16)
+    iv_inner = urandom(16)
+    key_inner = urandom(32)
+    key = aes_stretch(password, iv_outer)
+
+    encryptor = Cipher(algorithms.AES(key), modes.CBC(iv_outer), backend=default_backend()).encryptor()
+    iv_key_encrypted = encryptor.update(iv_inner + key_inner) + encryptor.finalize()
+
+    f_out.write(header)
+    f_out.write(iv_outer)
+    f_out.write(iv_key_encrypted)
+    f_out.write(new_hmac(key, iv_key_encrypted, sha256).digest())
+
+    encryptor = Cipher(algorithms.AES(key_inner), modes.CBC(iv_inner), backend=default_backend()).encryptor()
+    mac = new_hmac(key_inner, digestmod=sha256)
+    modulo = 0
+
+    while True:
+        data = f_in.read(buffer)
+
+        # Pad the last block with the padding length, it is not PKCS#7
+        if len(data) < buffer:
+            modulo = len(data) % 16
+            padding = (16 - modulo) % 16
+            text = encryptor.update(data + bytes([padding]) * padding) + encryptor.finalize()
+            mac.update(text)
+            f_out.write(text)
+            break
+
+        text = encryptor.update(data)
+        mac.update(text)
+        f_out.write(text)
+
+    f_out.write(bytes([modulo]))
+    f_out.write(mac.digest())
+
+
+def aes_stretch(password: str, iv: bytes) -> bytes:
+    # Stretch the password with the iv, 8192 rounds of SHA-256
+    digest = iv + bytes(16)
+    password = password.encode("utf_16_le")
+
+    for _ in range(8192):
+        digest = sha256(digest + password).digest()
+
+    return digest
+
+
+def aes_verify(f_in: BinaryIO, password: str, buffer: int, size: int) -> None:
+    # Check the HMAC of an AES Crypt stream without decrypting it, raise ValueError if it is corrupted
+    iv_key, remaining = aes_header(f_in, password, size)
+    mac = new_hmac(iv_key[16:], digestmod=sha256)
+
+    while remaining > 0:
+        data = f_in.read(min(buffer, remaining))
+
+        if not data:
+            raise ValueError("File is corrupted.")
+
+        remaining -= len(data)
+        mac.update(data)
+
+    _, mac_inner = aes_tail(f_in)
+
+    if not compare_digest(mac_inner, mac.digest()):
+        raise ValueError("Bad HMAC (file is corrupted).")
+
+
+def decrypt_stream(f_in: BinaryIO, f_out: BinaryIO, size: int) -> None:
+    # Decrypt a stream with the engine of the config
+    if glovar.crypt_engine == "native":
+        aes_decrypt(f_in, f_out, glovar.password, glovar.crypt_buffer * 1024, size)
+    else:
+        decryptStream(f_in, f_out, glovar.password, glovar.crypt_buffer * 1024, size)
+
+
+def encrypt_stream(f_in: BinaryIO, f_out: BinaryIO) -> None:
+    # Encrypt a stream with the engine of the config
+    if glovar.crypt_engine == "native":
+        aes_encrypt(f_in, f_out, glovar.password, glovar.crypt_buffer * 1024)
+    else:
+        encryptStream(f_in, f_out, glovar.password, glovar.crypt_buffer * 1024)
+
+
+def verify_stream(f_in: BinaryIO, size: int) -> None:
+    # Check the HMAC of a stream, both engines write the same format
+    aes_verify(f_in, glovar.password, glovar.crypt_buffer * 1024, size)
@@ -21,22 +21,22 @@ from functools import wraps
 
 from pyrogram.errors import FloodWait
 
-from .etc import thread, wait_flood
+from .etc import thread
 
 # Enable logging
 logger = logging.getLogger(__name__)
 
 
 def retry(func):
-    # FloodWait retry
+    # FloodWait retry, the function reports the flood to the rate limiter, the next try waits for its token
     @wraps(func)
     def wrapper(*args, **kwargs):
         result = None
         while True:
             try:
                 result = func(*args, **kwargs)
-            except FloodWait as e:
-                wait_flood(e)
+            except FloodWait:
+                continue
             except Exception as e:
                 logger.warning(f"Retry error: {e}", exc_info=True)
                 break
@@ -46,11 +46,11 @@ def retry(func):
     return wrapper
 
 
-def threaded(daemon: bool = True):
-    # Run with thread
+def threaded(daemon: bool = True, pool: str = "telegram"):
+    # Run with a worker of the pool
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            return thread(func, args, kwargs, daemon)
+            return thread(func, args, kwargs, daemon, pool)
         return wrapper
     return decorator
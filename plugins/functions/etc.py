@@ -19,15 +19,15 @@
 import logging
 from datetime import datetime
 from html import escape
-from json import dumps
-from random import choice, uniform
+from json import loads
+from queue import Full, Queue
+from random import choice
 from string import ascii_letters, digits
 from threading import Thread, Timer
-from time import localtime, sleep, strftime, time
-from typing import Any, Callable, Optional, Union
+from time import localtime, strftime, time
+from typing import Any, Callable, Optional, Tuple, Union
 
 from pyrogram import Message
-from pyrogram.errors import FloodWait
 
 from .. import glovar
 
@@ -49,21 +49,73 @@ def bold(text: Any) -> str:
 
 
 def button_data(action: str, action_type: str = None, data: Union[int, str] = None) -> Optional[bytes]:
-    # Get a button's bytes data
+    # Get a button's bytes data, the version character comes first, then the operation character
     result = None
     try:
-        button = {
-            "a": action,
-            "t": action_type,
-            "d": data
-        }
-        result = dumps(button).replace(" ", "").encode("utf-8")
+        if action == "none":
+            return glovar.button_none.encode("utf-8")
+
+        if action == "commit":
+            return glovar.button_commit.encode("utf-8")
+
+        if data is True:
+            value = "t"
+        elif data is False:
+            value = "f"
+        elif data is None:
+            value = ""
+        elif isinstance(data, int):
+            value = f"{data}"
+        else:
+            value = f"s{data}"
+
+        result = f"{glovar.button_version}s{action}|{action_type or ''}|{value}".encode("utf-8")
     except Exception as e:
         logger.warning(f"Button data error: {e}", exc_info=True)
 
     return result
 
 
+def button_parse(data: str) -> Tuple[str, Optional[str], Union[bool, int, str, None]]:
+    # Get a button's action, type and data from its callback data
+    result = glovar.button_parsed.get(data)
+
+    if result:
+        return result
+
+    # Buttons sent before the short codes
+    if data.startswith("{"):
+        button = loads(data)
+        return button["a"], button["t"], button["d"]
+
+    # Unknown version
+    if not data.startswith(glovar.button_version):
+        return "none", None, None
+
+    if data == glovar.button_none:
+        return "none", None, None
+
+    if data == glovar.button_commit:
+        return "commit", None, None
+
+    action, action_type, value = data[2:].split("|", 2)
+
+    if value == "t":
+        value = True
+    elif value == "f":
+        value = False
+    elif not value:
+        value = None
+    elif value[0] == "s":
+        value = value[1:]
+    else:
+        value = int(value)
+
+    result = (action, action_type or None, value)
+
+    return result
+
+
 def code(text: Any) -> str:
     # Get a code text
     try:
@@ -239,27 +291,90 @@ def random_str(i: int) -> str:
     return text
 
 
-def thread(target: Callable, args: tuple, kwargs: dict = None, daemon: bool = True) -> bool:
-    # Call a function using thread
-    result = False
+def pool_get(name: str) -> Optional[Queue]:
+    # Get the task queue of the pool, start its workers on first use
+    result = glovar.pools.get(name)
+
+    if result:
+        return result
 
     try:
-        t = Thread(target=target, args=args, kwargs=kwargs, daemon=daemon)
-        t.daemon = daemon
-        result = t.start() or True
+        with glovar.locks["pool"]:
+            result = glovar.pools.get(name)
+
+            if result or name not in glovar.pool_settings:
+                return result
+
+            size, limit, _ = glovar.pool_settings[name]
+            result = Queue(maxsize=limit)
+
+            for _ in range(size):
+                t = Thread(target=pool_work, args=(name, result), name=f"{name}-pool", daemon=True)
+                t.start()
+
+            glovar.pools[name] = result
     except Exception as e:
-        logger.warning(f"Thread error: {e}", exc_info=True)
+        logger.warning(f"Pool get error: {e}", exc_info=True)
 
     return result
 
 
-def wait_flood(e: FloodWait) -> bool:
-    # Wait flood secs
+def pool_work(name: str, queue: Queue) -> None:
+    # Run the tasks of the pool forever
+    stats = glovar.pool_stats[name]
+
+    while True:
+        queued, target, args, kwargs = queue.get()
+
+        try:
+            wait = time() - queued
+            stats["wait_total"] += wait
+            stats["wait_max"] = max(stats["wait_max"], wait)
+            target(*args, **(kwargs or {}))
+        except Exception as e:
+            logger.warning(f"Pool {name} work error: {e}", exc_info=True)
+        finally:
+            stats["completed"] += 1
+            queue.task_done()
+
+
+def thread(target: Callable, args: tuple, kwargs: dict = None, daemon: bool = True, pool: str = "telegram") -> bool:
+    # Call a function using a worker of the pool, non-daemon calls still get their own thread
+    result = False
+
     try:
-        sleep(e.x + uniform(0.5, 1.0))
+        queue = daemon and pool_get(pool)
+
+        if not queue:
+            t = Thread(target=target, args=args, kwargs=kwargs, daemon=daemon)
+            t.daemon = daemon
+            return t.start() or True
+
+        stats = glovar.pool_stats[pool]
+        stats["submitted"] += 1
+        stats["depth_max"] = max(stats["depth_max"], queue.qsize() + 1)
+        task = (time(), target, args, kwargs)
+
+        try:
+            queue.put_nowait(task)
+            return True
+        except Full:
+            pass
+
+        policy = glovar.pool_settings[pool][2]
+
+        if policy == "block":
+            queue.put(task)
+        elif policy == "caller":
+            stats["inline"] += 1
+            target(*args, **(kwargs or {}))
+        else:
+            stats["rejected"] += 1
+            logger.warning(f"Pool {pool} is full, drop {target.__name__}")
+            return False
 
-        return True
+        result = True
     except Exception as e:
-        logger.warning(f"Wait flood error: {e}", exc_info=True)
+        logger.warning(f"Thread error: {e}", exc_info=True)
 
-    return False
+    return result
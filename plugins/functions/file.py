@@ -17,41 +17,99 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import logging
-from os import remove
-from os.path import exists
-from pickle import dump
-from shutil import copyfile
+from copy import deepcopy
+from gzip import GzipFile
+from hashlib import sha256
+from io import BytesIO
+from json import dumps
+from lzma import LZMAFile
+from os import close, pipe, remove
+from os.path import exists, getsize
+from pickle import dump, dumps as dumps_pickle, load
+from shutil import copyfile, copyfileobj
+from tempfile import TemporaryFile, mkstemp
+from typing import Any, BinaryIO, List, Optional, Tuple
 
-from pyAesCrypt import decryptFile, encryptFile
 from pyrogram import Client
 
 from .. import glovar
-from .decorators import threaded
-from .etc import random_str
+from .crypt import decrypt_stream, encrypt_stream, verify_stream
+from .etc import delay, random_str, thread
 from .telegram import download_media
 
 # Enable logging
 logger = logging.getLogger(__name__)
 
 
-def crypt_file(operation: str, file_in: str, file_out: str) -> bool:
-    # Encrypt or decrypt a file
+def crypt_data(data: Any = None, file: str = None) -> str:
+    # Compress and encrypt the pickled data or the file into a new file in the tmp directory, return its path
+    result = ""
+
     try:
-        if not file_in or not file_out:
-            return True
+        handle, path = mkstemp(dir="tmp")
 
-        buffer = 64 * 1024
+        with open(handle, "wb") as f_out:
+            if file:
+                with open(file, "rb") as f_in:
+                    encrypt_stream(get_compressed(f_in), f_out)
+            else:
+                encrypt_stream(get_compressed(BytesIO(dumps_pickle(data))), f_out)
 
-        if operation == "decrypt":
-            decryptFile(file_in, file_out, glovar.password, buffer)
-        else:
-            encryptFile(file_in, file_out, glovar.password, buffer)
+        result = path
+    except Exception as e:
+        logger.warning(f"Crypt data error: {e}", exc_info=True)
 
-        return True
+    return result
+
+
+def crypt_load(path: str) -> Any:
+    # Decrypt the file as a stream, unpickle the data while it is being decrypted and decompressed
+    result = None
+
+    try:
+        # Check the HMAC first without decrypting, never unpickle unauthenticated data
+        with open(path, "rb") as f_in:
+            verify_stream(f_in, getsize(path))
+
+        # A worker of the crypto pool decrypts into the pipe, this thread reads it
+        read_handle, write_handle = pipe()
+
+        if not thread(crypt_pipe, (path, write_handle), pool="crypto"):
+            close(read_handle)
+            close(write_handle)
+            return None
+
+        with open(read_handle, "rb") as f:
+            f_in = get_decompressed(f)
+
+            if not f_in:
+                return None
+
+            with f_in:
+                result = load(f_in)
     except Exception as e:
-        logger.warning(f"Crypt file error: {e}", exc_info=True)
+        logger.warning(f"Crypt load error: {e}", exc_info=True)
 
-    return False
+    return result
+
+
+def crypt_pipe(path: str, handle: int) -> bool:
+    # Decrypt the file into the pipe
+    result = False
+
+    try:
+        # Open the pipe first, it is closed even if the file can not be read, the reader never hangs
+        with open(handle, "wb") as f_out, open(path, "rb") as f_in:
+            decrypt_stream(f_in, f_out, getsize(path))
+
+        result = True
+    except BrokenPipeError:
+        # The reader stopped early
+        pass
+    except Exception as e:
+        logger.warning(f"Crypt pipe error: {e}", exc_info=True)
+
+    return result
 
 
 def delete_file(path: str) -> bool:
@@ -67,6 +125,92 @@ def delete_file(path: str) -> bool:
     return False
 
 
+def get_compressed(f_in: BinaryIO) -> BinaryIO:
+    # Compress the stream if it is enabled, the format's own header tells the receivers
+    result = None
+
+    try:
+        if glovar.compress == "none":
+            return f_in
+
+        stream = BytesIO()
+
+        if glovar.compress == "zlib":
+            f_out = GzipFile(fileobj=stream, mode="wb", compresslevel=glovar.compress_level, mtime=0)
+        else:
+            f_out = LZMAFile(stream, "wb", preset=glovar.compress_level)
+
+        with f_out:
+            copyfileobj(f_in, f_out, 1024 * 1024)
+
+        stream.seek(0)
+        result = stream
+    except Exception as e:
+        logger.warning(f"Get compressed error: {e}", exc_info=True)
+
+    return result
+
+
+def get_decompressed(f_in: BinaryIO) -> Optional[BinaryIO]:
+    # Detect the compression by the header, return None if the decompressed data is too large
+    result = None
+
+    try:
+        head = f_in.peek(6)[:6]
+
+        if head[:2] == b"\x1f\x8b":
+            f_compressed = GzipFile(fileobj=f_in, mode="rb")
+        elif head == b"\xfd7zXZ\x00":
+            f_compressed = LZMAFile(f_in, "rb")
+        else:
+            # Pickle data always starts with b"\x80"
+            return f_in
+
+        limit = glovar.file_limit * glovar.file_ratio * 1024 * 1024
+        size = 0
+        result = TemporaryFile(dir="tmp")
+
+        with f_compressed:
+            for chunk in iter(lambda: f_compressed.read(1024 * 1024), b""):
+                size += len(chunk)
+
+                if size > limit:
+                    raise ValueError(f"Decompressed data is larger than {limit} bytes")
+
+                result.write(chunk)
+
+        result.seek(0)
+    except Exception as e:
+        if result:
+            result.close()
+
+        result = None
+        logger.warning(f"Get decompressed error: {e}", exc_info=True)
+
+    return result
+
+
+def get_digest(path: str) -> str:
+    # Get the SHA-256 digest of the file's content
+    result = ""
+
+    try:
+        if not exists(path):
+            return ""
+
+        digest = sha256()
+
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+
+        result = digest.hexdigest()
+    except Exception as e:
+        logger.warning(f"Get digest error: {e}", exc_info=True)
+
+    return result
+
+
 def get_downloaded_path(client: Client, file_id: str, file_ref: str) -> str:
     # Download file, get it's path on local machine
     final_path = ""
@@ -98,20 +242,121 @@ def get_new_path(extension: str = "", prefix: str = "") -> str:
     return result
 
 
-@threaded(daemon=False)
+def journal(action: str, key: str, data: dict = None) -> bool:
+    # Append a config session mutation to the journal
+    return journal_records([(action, key, data)])
+
+
+def journal_records(records: List[Tuple[str, str, Optional[dict]]]) -> bool:
+    # Append some config session mutations to the journal in one write
+    result = False
+    compact = False
+
+    glovar.locks["journal"].acquire()
+
+    try:
+        lines = [dumps({"a": action, "k": key, "d": data}, separators=(",", ":")) for action, key, data in records]
+
+        with open(glovar.journal_path, "a") as f:
+            f.write("".join(f"{line}\n" for line in lines))
+
+        # Only one compaction is pending at a time
+        glovar.journal_count += len(lines)
+        compact = glovar.journal_count >= glovar.journal_limit and not glovar.journal_compacting
+        glovar.journal_compacting = glovar.journal_compacting or compact
+        result = True
+    except Exception as e:
+        logger.warning(f"Journal error: {e}", exc_info=True)
+    finally:
+        glovar.locks["journal"].release()
+
+    # Compact the journal into the snapshot in the background
+    if compact and not save("configs"):
+        glovar.journal_compacting = False
+
+    return result
+
+
 def save(file: str) -> bool:
-    # Save a global variable to a file
+    # Mark a global variable as dirty, it will be saved at the end of the save window
     result = False
 
+    glovar.locks["save"].acquire()
+
+    try:
+        glovar.save_stats["requested"] += 1
+
+        if file in glovar.save_dirty:
+            glovar.save_stats["coalesced"] += 1
+            return True
+
+        pending = bool(glovar.save_dirty)
+        glovar.save_dirty.add(file)
+
+        if pending:
+            return True
+
+        result = delay(glovar.save_window, thread, [save_flush, (), None, True, "io"])
+    except Exception as e:
+        logger.warning(f"Save error: {e}", exc_info=True)
+    finally:
+        glovar.locks["save"].release()
+
+    return result
+
+
+def save_data(file: str, data: Any = None) -> bool:
+    # Save a global variable or the given data to a file, truncate the journal
+    result = False
+
+    glovar.locks["journal"].acquire()
+
     try:
         if not glovar:
             return False
 
+        # Copy the config sessions under the store lock, asks and expiries change them while they are pickled
+        if file == "configs":
+            with glovar.locks["store"]:
+                data = deepcopy(glovar.configs if data is None else data)
+        elif data is None:
+            data = eval(f"glovar.{file}")
+
         with open(f"data/.{file}", "wb") as f:
-            dump(eval(f"glovar.{file}"), f)
+            dump(data, f)
 
         result = copyfile(f"data/.{file}", f"data/{file}") or True
+
+        if file == "configs":
+            open(glovar.journal_path, "w").close()
+            glovar.journal_count = 0
     except Exception as e:
-        logger.warning(f"Save error: {e}", exc_info=True)
+        logger.warning(f"Save data error: {e}", exc_info=True)
+    finally:
+        # A failed compaction is triggered again by the next journal write
+        if file == "configs":
+            glovar.journal_compacting = False
+
+        glovar.locks["journal"].release()
+
+    return result
+
+
+def save_flush() -> bool:
+    # Save all dirty global variables
+    result = False
+
+    try:
+        with glovar.locks["save"]:
+            files = list(glovar.save_dirty)
+            glovar.save_dirty.clear()
+
+        for file in files:
+            save_data(file)
+            glovar.save_stats["flushed"] += 1
+
+        result = True
+    except Exception as e:
+        logger.warning(f"Save flush error: {e}", exc_info=True)
 
     return result
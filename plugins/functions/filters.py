@@ -123,6 +123,19 @@ def is_test_group(_, update: Union[CallbackQuery, Message]) -> bool:
     return False
 
 
+def is_to_sender(_, message: Message) -> bool:
+    # Check if the exchange data may be sent to this bot, by the quoted name in the receivers, without parsing
+    try:
+        text = message.text or message.caption
+
+        if text and glovar.sender_quoted in text:
+            return True
+    except Exception as e:
+        logger.warning(f"Is to sender error: {e}", exc_info=True)
+
+    return False
+
+
 aio = Filters.create(
     func=is_aio,
     name="AIO"
@@ -152,3 +165,8 @@ test_group = Filters.create(
     func=is_test_group,
     name="Test Group"
 )
+
+to_sender = Filters.create(
+    func=is_to_sender,
+    name="To Sender"
+)
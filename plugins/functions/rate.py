@@ -0,0 +1,129 @@
+# SCP-079-CONFIG - Manage the settings of each bot
+# Copyright (C) 2019-2020 SCP-079 <https://scp-079.org>
+#
+# This file is part of SCP-079-CONFIG.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+from random import uniform
+from time import sleep, time
+from typing import Dict, Optional, Union
+
+from pyrogram.errors import FloodWait
+
+from .. import glovar
+
+# Enable logging
+logger = logging.getLogger(__name__)
+
+
+def get_bucket(cid: Optional[Union[int, str]]) -> Dict[str, float]:
+    # Get the bucket of a chat or a named kind of request, None means the global bucket, call it with the rate lock
+    result = glovar.rate_buckets.get(cid)
+
+    if result:
+        return result
+
+    rate = glovar.rate_chat if isinstance(cid, int) else glovar.rate_global
+    result = {
+        "rate": rate,
+        "limit": rate,
+        "burst": max(rate, 3.0),
+        "tokens": max(rate, 3.0),
+        "updated": time(),
+        "blocked": 0.0
+    }
+    glovar.rate_buckets[cid] = result
+
+    return result
+
+
+def get_wait(bucket: Dict[str, float], now: float) -> float:
+    # Refill the bucket, get the seconds to wait for one token, call it with the rate lock
+    bucket["tokens"] = min(bucket["burst"], bucket["tokens"] + (now - bucket["updated"]) * bucket["rate"])
+    bucket["updated"] = now
+
+    if now < bucket["blocked"]:
+        return bucket["blocked"] - now
+
+    if bucket["tokens"] >= 1:
+        return 0.0
+
+    return (1 - bucket["tokens"]) / bucket["rate"]
+
+
+def rate_acquire(cid: Optional[Union[int, str]] = None) -> bool:
+    # Wait until both the global bucket and the chat's bucket have a token, then take them
+    result = False
+
+    try:
+        while True:
+            with glovar.locks["rate"]:
+                now = time()
+                buckets = [get_bucket(None)] + ([get_bucket(cid)] if cid is not None else [])
+                wait = max(get_wait(bucket, now) for bucket in buckets)
+
+                if wait <= 0:
+                    for bucket in buckets:
+                        bucket["tokens"] -= 1
+
+                    glovar.rate_stats["acquired"] += 1
+
+                    return True
+
+                glovar.rate_stats["waited"] += wait
+
+            sleep(wait)
+    except Exception as e:
+        logger.warning(f"Rate acquire error: {e}", exc_info=True)
+
+    return result
+
+
+def rate_done(cid: Optional[Union[int, str]] = None) -> bool:
+    # A request succeeded, increase the chat's rate additively
+    result = False
+
+    try:
+        with glovar.locks["rate"]:
+            bucket = get_bucket(cid)
+
+            if bucket["rate"] < bucket["limit"]:
+                bucket["rate"] = min(bucket["limit"], bucket["rate"] + bucket["limit"] * glovar.rate_increase)
+
+        result = True
+    except Exception as e:
+        logger.warning(f"Rate done error: {e}", exc_info=True)
+
+    return result
+
+
+def rate_flood(e: FloodWait, cid: Optional[Union[int, str]] = None) -> bool:
+    # A request got FloodWait, stop the chat's bucket for every caller and halve its rate
+    result = False
+
+    try:
+        with glovar.locks["rate"]:
+            bucket = get_bucket(cid)
+            bucket["blocked"] = max(bucket["blocked"], time() + e.x + uniform(0.5, 1.0))
+            bucket["rate"] = max(bucket["limit"] * glovar.rate_floor, bucket["rate"] / 2)
+            bucket["tokens"] = 0.0
+            glovar.rate_stats["flood"] += 1
+
+        result = True
+    except Exception as e:
+        logger.warning(f"Rate flood error: {e}", exc_info=True)
+
+    return result
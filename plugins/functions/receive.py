@@ -18,54 +18,130 @@
 
 import logging
 import pickle
+from base64 import b85decode
 from json import loads
-from typing import Any
+from typing import Any, List, Tuple, Union
+from zlib import decompress
 
 from pyrogram import Client, Message
 
 from .. import glovar
 from .channel import share_data
-from .config import get_config_message
-from .etc import code, general_link, get_now, get_text, lang, mention_id, message_link, random_str, thread
-from .file import crypt_file, delete_file, get_downloaded_path, get_new_path, save
+from .config import get_config_message, get_fingerprint, remove_old
+from .etc import (code, general_link, get_channel_link, get_now, get_text, lang, mention_id, message_link, random_str,
+                  thread)
+from .file import crypt_load, delete_file, get_downloaded_path, save
+from .store import store_bind, store_create, store_find, store_get, store_refresh, store_remove, store_reset
 from .telegram import send_message
+from .timers import backup_files
 
 # Enable logging
 logger = logging.getLogger(__name__)
 
 
+def receive_bus(client: Client, data: dict) -> bool:
+    # Receive the data delivered by the in-process bus
+    result = False
+
+    try:
+        if data["action"] == "envelope":
+            records = data["data"]
+        else:
+            records = [data]
+
+        for record in records:
+            receive_record(client, record)
+
+        result = True
+    except Exception as e:
+        logger.warning(f"Receive bus error: {e}", exc_info=True)
+
+    return result
+
+
 def receive_config_ask(client: Client, sender: str, data: dict) -> bool:
-    # Receive config ask
+    # Receive config ask, only the store is changed here, a worker sends the messages
     result = False
 
     try:
+        # Set basic data
+        session = data
+        session["type"] = sender.lower()
+        session["lock"] = False
+        session["commit"] = False
+        session["time"] = get_now()
+        session["message_id"] = None
+
+        # Reuse the live session asked by the same user for the same group and bot
+        key = store_find(session["group_id"], session["type"], session["user_id"])
+        old = key and store_get(key)
+
+        if old and glovar.ask_supersede:
+            remove_old(client, [key])
+
+            # A locked session is being changed by a callback, it is not removed, reuse it instead
+            old = store_get(key)
+
+        if old and old.get("message_id"):
+            # Give the reused session the full time again
+            old["time"] = session["time"]
+            store_refresh(key, old)
+            return thread(receive_config_reply, (client, sender, old))
+        elif old:
+            # The message of the first ask is still being sent, it will reply
+            return True
+
         # Generate a new config key
         key = random_str(8)
 
-        while glovar.configs.get(key):
+        while store_get(key):
             key = random_str(8)
 
-        # Set basic data
-        glovar.configs[key] = data
-        glovar.configs[key]["type"] = sender.lower()
-        glovar.configs[key]["lock"] = False
-        glovar.configs[key]["commit"] = False
-        glovar.configs[key]["time"] = get_now()
+        if not store_create(key, session):
+            return False
 
+        result = thread(receive_config_send, (client, sender, key, session))
+    except Exception as e:
+        logger.warning(f"Receive config ask error: {e}", exc_info=True)
+
+    return result
+
+
+def receive_config_send(client: Client, sender: str, key: str, session: dict) -> bool:
+    # Send the config session message, then reply to the sender
+    result = False
+
+    try:
         # Send the config session message
-        text, markup = get_config_message(key)
+        text, markup = get_config_message(key, session)
         result = send_message(client, glovar.config_channel_id, text, None, markup)
 
-        # If something goes wrong, pop the config
+        # If something goes wrong, drop the config
         if not result:
-            glovar.configs.pop(key, {})
             logger.warning(f"I can't send the message to the CONFIG channel")
+            store_remove([key])
             return False
 
         # Initiate the check process
-        glovar.configs[key]["message_id"] = result.message_id
-        group_id = glovar.configs[key]["group_id"]
-        user_id = glovar.configs[key]["user_id"]
+        session["message_id"] = result.message_id
+        session["config_link"] = message_link(result)
+        glovar.markup_sent[result.message_id] = get_fingerprint(session)
+        store_bind(key, session)
+        result = receive_config_reply(client, sender, session)
+    except Exception as e:
+        logger.warning(f"Receive config send error: {e}", exc_info=True)
+
+    return result
+
+
+def receive_config_reply(client: Client, sender: str, session: dict) -> bool:
+    # Reply the link of the config session message to the sender
+    result = False
+
+    try:
+        group_id = session["group_id"]
+        user_id = session["user_id"]
+        link = session.get("config_link") or f"{get_channel_link(glovar.config_channel_id)}/{session['message_id']}"
         share_data(
             client=client,
             receivers=[sender],
@@ -74,14 +150,13 @@ def receive_config_ask(client: Client, sender: str, data: dict) -> bool:
             data={
                 "group_id": group_id,
                 "user_id": user_id,
-                "config_link": message_link(result)
+                "config_link": link
             }
         )
-        save("configs")
 
         result = True
     except Exception as e:
-        logger.warning(f"Receive config ask error: {e}", exc_info=True)
+        logger.warning(f"Receive config reply error: {e}", exc_info=True)
 
     return result
 
@@ -94,6 +169,10 @@ def receive_file_data(client: Client, message: Message, decrypt: bool = True) ->
         if not message.document:
             return None
 
+        if (message.document.file_size or 0) > glovar.file_limit * 1024 * 1024:
+            logger.warning(f"File {message.document.file_id} is larger than {glovar.file_limit} MB")
+            return None
+
         file_id = message.document.file_id
         file_ref = message.document.file_ref
         path = get_downloaded_path(client, file_id, file_ref)
@@ -102,20 +181,14 @@ def receive_file_data(client: Client, message: Message, decrypt: bool = True) ->
             return None
 
         if decrypt:
-            # Decrypt the file, save to the tmp directory
-            path_decrypted = get_new_path()
-            crypt_file("decrypt", path, path_decrypted)
-            path_final = path_decrypted
+            # Decrypt the file and unpickle it in one pass
+            result = crypt_load(path)
         else:
             # Read the file directly
-            path_decrypted = ""
-            path_final = path
-
-        with open(path_final, "rb") as f:
-            result = pickle.load(f)
+            with open(path, "rb") as f:
+                result = pickle.load(f)
 
-        for f in {path, path_decrypted}:
-            thread(delete_file, (f,))
+        thread(delete_file, (path,), pool="io")
     except Exception as e:
         logger.warning(f"Receive file error: {e}", exc_info=True)
 
@@ -135,8 +208,12 @@ def receive_rollback(client: Client, message: Message, data: dict) -> bool:
         if the_data is None:
             return False
 
-        exec(f"glovar.{the_type} = the_data")
-        save(the_type)
+        with glovar.locks["receive"]:
+            if the_type == "configs":
+                store_reset(the_data)
+            else:
+                exec(f"glovar.{the_type} = the_data")
+                save(the_type)
 
         # Send debug message
         text = (f"{lang('project')}{lang('colon')}{general_link(glovar.project_name, glovar.project_link)}\n"
@@ -152,6 +229,93 @@ def receive_rollback(client: Client, message: Message, data: dict) -> bool:
     return result
 
 
+def receive_record(client: Client, record: dict, message: Message = None) -> bool:
+    # Receive a record of the exchange data, the message is None if the record came from the bus
+    result = False
+
+    try:
+        sender = record["from"]
+        receivers = record["to"]
+        action = record["action"]
+        action_type = record["type"]
+        data = record["data"]
+
+        if glovar.sender not in receivers:
+            return False
+
+        # Drop the record sent again in another message
+        if record.get("id") and receive_seen((sender, record["id"])):
+            return False
+
+        # The data was too large for a message
+        if record.get("spill"):
+            data = receive_file_data(client, message)
+
+        if sender in {"CAPTCHA", "CLEAN", "LANG", "LONG", "NOFLOOD", "NOPORN",
+                      "NOSPAM", "TIP", "USER", "WARN"}:
+
+            if action == "config":
+                if action_type == "ask":
+                    with glovar.locks["receive"]:
+                        receive_config_ask(client, sender, data)
+
+        elif sender == "MANAGE":
+
+            if action == "backup":
+                if action_type == "now":
+                    thread(backup_files, (client,), pool="io")
+                elif action_type == "rollback" and message:
+                    receive_rollback(client, message, data)
+
+        result = True
+    except Exception as e:
+        logger.warning(f"Receive record error: {e}", exc_info=True)
+
+    return result
+
+
+def receive_records(message: Message) -> List[dict]:
+    # Receive the records of the text data, an envelope holds several records
+    result = []
+
+    try:
+        data = receive_text_data(message)
+
+        if not data:
+            return []
+
+        if data["action"] != "envelope":
+            return [data]
+
+        result = data["data"]
+    except Exception as e:
+        logger.warning(f"Receive records error: {e}", exc_info=True)
+
+    return result
+
+
+def receive_seen(key: Tuple[Union[int, str], Union[int, str]]) -> bool:
+    # Check if the exchange data was received before, remember it if not
+    result = False
+
+    try:
+        with glovar.locks["seen"]:
+            if key in glovar.seen_cache:
+                glovar.seen_cache.move_to_end(key)
+                glovar.seen_stats["hit"] += 1
+                return True
+
+            glovar.seen_cache[key] = True
+            glovar.seen_stats["miss"] += 1
+
+            if len(glovar.seen_cache) > glovar.seen_limit:
+                glovar.seen_cache.popitem(last=False)
+    except Exception as e:
+        logger.warning(f"Receive seen error: {e}", exc_info=True)
+
+    return result
+
+
 def receive_text_data(message: Message) -> dict:
     # Receive text's data from exchange channel
     result = {}
@@ -163,6 +327,18 @@ def receive_text_data(message: Message) -> dict:
             return {}
 
         result = loads(text)
+
+        # The compact format
+        if result.get("v") == 2:
+            result = {
+                "from": result["f"],
+                "to": result["r"],
+                "action": result["a"],
+                "type": result["t"],
+                "data": loads(decompress(b85decode(result["z"]))) if result.get("z") else result.get("d"),
+                "spill": bool(result.get("s")),
+                "id": result.get("i")
+            }
     except Exception as e:
         logger.warning(f"Receive text data error: {e}")
 
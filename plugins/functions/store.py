@@ -0,0 +1,435 @@
+# SCP-079-CONFIG - Manage the settings of each bot
+# Copyright (C) 2019-2020 SCP-079 <https://scp-079.org>
+#
+# This file is part of SCP-079-CONFIG.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+from heapq import heapify, heappop, heappush
+from json import dumps, loads
+from sqlite3 import IntegrityError
+from typing import Dict, List, Optional, Tuple
+
+from .. import glovar
+from .file import journal, journal_records, save_data
+
+# Enable logging
+logger = logging.getLogger(__name__)
+
+
+def get_row(key: str, session: dict) -> tuple:
+    # Get a database row of the config session
+    return (key, session["type"], session["group_id"], session["user_id"], session.get("message_id"),
+            session["time"], int(session["lock"]), int(session["commit"]), dumps(session))
+
+
+def get_ask(session: dict) -> Tuple[int, str, int]:
+    # Get the ask index key of the config session
+    return session["group_id"], session["type"], session["user_id"]
+
+
+def get_session(row: tuple) -> dict:
+    # Get a config session from the database row
+    locked, committed, data = row
+    session = loads(data)
+    session["lock"] = bool(locked)
+    session["commit"] = bool(committed)
+
+    return session
+
+
+def store_bind(key: str, session: dict) -> bool:
+    # Bind the config session to its sent message
+    result = False
+
+    try:
+        mid = session["message_id"]
+
+        if glovar.store == "sqlite":
+            with glovar.locks["store"]:
+                glovar.connection.execute("UPDATE sessions SET message_id = ?, data = ? WHERE key = ?",
+                                          (mid, dumps(session), key))
+        else:
+            with glovar.locks["store"]:
+                if not glovar.configs.get(key):
+                    return False
+
+                glovar.configs[key]["message_id"] = mid
+                glovar.configs[key]["config_link"] = session.get("config_link")
+                glovar.messages[mid] = key
+
+            journal("bind", key, {"message_id": mid, "config_link": session.get("config_link")})
+
+        result = True
+    except Exception as e:
+        logger.warning(f"Store bind error: {e}", exc_info=True)
+
+    return result
+
+
+def store_create(key: str, session: dict) -> bool:
+    # Add a new config session, return False if the key is already used
+    result = False
+
+    try:
+        if glovar.store == "sqlite":
+            with glovar.locks["store"]:
+                glovar.connection.execute("INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                          get_row(key, session))
+        else:
+            with glovar.locks["store"]:
+                if key in glovar.configs:
+                    return False
+
+                glovar.configs[key] = session
+                glovar.asks[get_ask(session)] = key
+
+                if session.get("message_id"):
+                    glovar.messages[session["message_id"]] = key
+
+                heappush(glovar.expiry, (session["time"], key))
+
+            journal("create", key, session)
+
+        result = True
+    except IntegrityError:
+        return False
+    except Exception as e:
+        logger.warning(f"Store create error: {e}", exc_info=True)
+
+    return result
+
+
+def store_dump() -> Dict[str, dict]:
+    # Get all config sessions
+    result = {}
+
+    try:
+        if glovar.store == "sqlite":
+            with glovar.locks["store"]:
+                rows = glovar.connection.execute("SELECT key, locked, committed, data FROM sessions").fetchall()
+
+            result = {row[0]: get_session(row[1:]) for row in rows}
+        else:
+            result = glovar.configs
+    except Exception as e:
+        logger.warning(f"Store dump error: {e}", exc_info=True)
+
+    return result
+
+
+def store_expired(before: int) -> List[str]:
+    # Pop the keys of unlocked config sessions created before the time
+    result = []
+
+    try:
+        with glovar.locks["store"]:
+            if glovar.store == "sqlite":
+                rows = glovar.connection.execute("SELECT key FROM sessions WHERE time <= ? AND locked = 0",
+                                                 (before,)).fetchall()
+                return [row[0] for row in rows]
+
+            locked = []
+
+            while glovar.expiry and glovar.expiry[0][0] <= before:
+                time, key = heappop(glovar.expiry)
+                session = glovar.configs.get(key)
+
+                # Stale index entry
+                if not session or session["time"] != time:
+                    continue
+
+                # Check again in the next round
+                if session["lock"]:
+                    locked.append((time, key))
+                    continue
+
+                result.append(key)
+
+            for item in locked:
+                heappush(glovar.expiry, item)
+    except Exception as e:
+        logger.warning(f"Store expired error: {e}", exc_info=True)
+
+    return result
+
+
+def store_find(group_id: int, the_type: str, user_id: int) -> Optional[str]:
+    # Find the key of the live config session asked by the user for the group and the bot
+    result = None
+
+    try:
+        if glovar.store == "sqlite":
+            with glovar.locks["store"]:
+                row = glovar.connection.execute("SELECT key FROM sessions WHERE group_id = ? AND type = ? "
+                                                "AND user_id = ? AND committed = 0",
+                                                (group_id, the_type, user_id)).fetchone()
+
+            result = row and row[0]
+        else:
+            result = glovar.asks.get((group_id, the_type, user_id))
+    except Exception as e:
+        logger.warning(f"Store find error: {e}", exc_info=True)
+
+    return result
+
+
+def store_get(key: str) -> Optional[dict]:
+    # Get a config session
+    result = None
+
+    try:
+        if glovar.store == "sqlite":
+            with glovar.locks["store"]:
+                row = glovar.connection.execute("SELECT locked, committed, data FROM sessions WHERE key = ?",
+                                                (key,)).fetchone()
+
+            result = row and get_session(row)
+        else:
+            result = glovar.configs.get(key)
+    except Exception as e:
+        logger.warning(f"Store get error: {e}", exc_info=True)
+
+    return result
+
+
+def store_key(mid: int) -> Optional[str]:
+    # Get the key of the config session by its message id
+    result = None
+
+    try:
+        if glovar.store == "sqlite":
+            with glovar.locks["store"]:
+                row = glovar.connection.execute("SELECT key FROM sessions WHERE message_id = ?", (mid,)).fetchone()
+
+            result = row and row[0]
+        else:
+            result = glovar.messages.get(mid)
+    except Exception as e:
+        logger.warning(f"Store key error: {e}", exc_info=True)
+
+    return result
+
+
+def store_lock(key: str) -> bool:
+    # Lock a config session until the callback is answered, return False if it is locked or committed
+    result = False
+
+    try:
+        with glovar.locks["store"]:
+            if glovar.store == "sqlite":
+                cursor = glovar.connection.execute("UPDATE sessions SET locked = 1 "
+                                                   "WHERE key = ? AND locked = 0 AND committed = 0", (key,))
+                result = cursor.rowcount == 1
+            else:
+                session = glovar.configs.get(key)
+
+                if not session or session["lock"] or session["commit"]:
+                    return False
+
+                session["lock"] = True
+                result = True
+    except Exception as e:
+        logger.warning(f"Store lock error: {e}", exc_info=True)
+
+    return result
+
+
+def store_refresh(key: str, session: dict) -> bool:
+    # Move the expiry of a reused config session to its new time
+    result = False
+
+    try:
+        time = session["time"]
+
+        with glovar.locks["store"]:
+            if glovar.store == "sqlite":
+                glovar.connection.execute("UPDATE sessions SET time = ?, data = json_set(data, '$.time', ?) "
+                                          "WHERE key = ?", (time, time, key))
+            elif glovar.configs.get(key):
+                glovar.configs[key]["time"] = time
+                heappush(glovar.expiry, (time, key))
+            else:
+                return False
+
+        if glovar.store != "sqlite":
+            journal("refresh", key, time)
+
+        result = True
+    except Exception as e:
+        logger.warning(f"Store refresh error: {e}", exc_info=True)
+
+    return result
+
+
+def store_remove(keys: List[str]) -> bool:
+    # Remove some config sessions in one transaction
+    result = False
+
+    try:
+        if not keys:
+            return True
+
+        if glovar.store == "sqlite":
+            with glovar.locks["store"]:
+                glovar.connection.execute("BEGIN")
+
+                try:
+                    glovar.connection.executemany("DELETE FROM sessions WHERE key = ?", [(key,) for key in keys])
+                    glovar.connection.execute("COMMIT")
+                except Exception:
+                    # Never leave the autocommit connection inside an open transaction
+                    glovar.connection.execute("ROLLBACK")
+                    raise
+        else:
+            with glovar.locks["store"]:
+                for key in keys:
+                    session = glovar.configs.pop(key, {})
+
+                    if not session:
+                        continue
+
+                    glovar.messages.pop(session.get("message_id"), None)
+
+                    if glovar.asks.get(get_ask(session)) == key:
+                        glovar.asks.pop(get_ask(session))
+
+            journal_records([("expire", key, None) for key in keys])
+
+        result = True
+    except Exception as e:
+        logger.warning(f"Store remove error: {e}", exc_info=True)
+
+    return result
+
+
+def store_requeue(key: str, session: dict) -> bool:
+    # Put a popped config session back to the expiry index
+    result = False
+
+    try:
+        if glovar.store == "sqlite":
+            # The expired sessions are queried by time, nothing is popped
+            return True
+
+        with glovar.locks["store"]:
+            if glovar.configs.get(key):
+                heappush(glovar.expiry, (session["time"], key))
+
+        result = True
+    except Exception as e:
+        logger.warning(f"Store requeue error: {e}", exc_info=True)
+
+    return result
+
+
+def store_reset(data: Dict[str, dict]) -> bool:
+    # Replace all config sessions
+    result = False
+
+    try:
+        if glovar.store == "sqlite":
+            with glovar.locks["store"]:
+                glovar.connection.execute("BEGIN")
+
+                try:
+                    glovar.connection.execute("DELETE FROM sessions")
+                    glovar.connection.executemany("INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                                  [get_row(key, data[key]) for key in data])
+                    glovar.connection.execute("COMMIT")
+                except Exception:
+                    # Never leave the autocommit connection inside an open transaction
+                    glovar.connection.execute("ROLLBACK")
+                    raise
+        else:
+            with glovar.locks["store"]:
+                glovar.configs = data
+                glovar.messages = {data[key]["message_id"]: key for key in data if data[key].get("message_id")}
+                glovar.asks = {get_ask(data[key]): key for key in data if not data[key]["commit"]}
+                glovar.expiry = [(data[key]["time"], key) for key in data]
+                heapify(glovar.expiry)
+
+        # The sent markups belong to the replaced sessions
+        glovar.markup_sent.clear()
+
+        result = save_data("configs", data)
+    except Exception as e:
+        logger.warning(f"Store reset error: {e}", exc_info=True)
+
+    return result
+
+
+def store_snapshot() -> bool:
+    # Write the snapshot of all config sessions to the data file, return False if there is no session
+    result = False
+
+    try:
+        data = store_dump()
+
+        if not data:
+            return False
+
+        result = save_data("configs", data)
+    except Exception as e:
+        logger.warning(f"Store snapshot error: {e}", exc_info=True)
+
+    return result
+
+
+def store_unlock(key: str) -> bool:
+    # Unlock a config session
+    result = False
+
+    try:
+        with glovar.locks["store"]:
+            if glovar.store == "sqlite":
+                glovar.connection.execute("UPDATE sessions SET locked = 0 WHERE key = ?", (key,))
+            elif glovar.configs.get(key):
+                glovar.configs[key]["lock"] = False
+
+        result = True
+    except Exception as e:
+        logger.warning(f"Store unlock error: {e}", exc_info=True)
+
+    return result
+
+
+def store_update(key: str, session: dict, action: str = "toggle") -> bool:
+    # Write back a changed config session, the action is toggle, default or commit
+    result = False
+
+    try:
+        if glovar.store == "sqlite":
+            row = get_row(key, session)
+
+            # Only store_refresh moves the time, keep the stored one
+            with glovar.locks["store"]:
+                glovar.connection.execute("UPDATE sessions SET type = ?, group_id = ?, user_id = ?, message_id = ?, "
+                                          "committed = ?, data = json_set(?, '$.time', json_extract(data, '$.time')) "
+                                          "WHERE key = ?",
+                                          row[1:5] + row[7:] + (key,))
+        else:
+            if action == "commit":
+                with glovar.locks["store"]:
+                    if glovar.asks.get(get_ask(session)) == key:
+                        glovar.asks.pop(get_ask(session))
+
+            journal(action, key, session["config"])
+
+        result = True
+    except Exception as e:
+        logger.warning(f"Store update error: {e}", exc_info=True)
+
+    return result
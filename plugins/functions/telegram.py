@@ -23,8 +23,9 @@ from pyrogram import Client, InlineKeyboardMarkup, Message
 from pyrogram.errors import ChatAdminRequired, ButtonDataInvalid, ButtonUrlInvalid, ChannelInvalid, ChannelPrivate
 from pyrogram.errors import FloodWait, MessageDeleteForbidden, PeerIdInvalid
 
-from .etc import delay, wait_flood
+from .etc import delay
 from .decorators import retry
+from .rate import rate_acquire, rate_done, rate_flood
 
 # Enable logging
 logger = logging.getLogger(__name__)
@@ -38,13 +39,15 @@ def answer_callback(client: Client, query_id: str, text: str) -> Optional[bool]:
         while flood_wait:
             flood_wait = False
             try:
+                rate_acquire("callback")
                 result = client.answer_callback_query(
                     callback_query_id=query_id,
                     text=text
                 )
+                rate_done("callback")
             except FloodWait as e:
                 flood_wait = True
-                wait_flood(e)
+                rate_flood(e, "callback")
     except Exception as e:
         logger.warning(f"Answer query to {query_id} error: {e}", exc_info=True)
 
@@ -76,8 +79,11 @@ def delete_messages_100(client: Client, cid: int, mids: Iterable[int]) -> Option
 
     try:
         mids = list(mids)
+        rate_acquire(cid)
         result = client.delete_messages(chat_id=cid, message_ids=mids)
+        rate_done(cid)
     except FloodWait as e:
+        rate_flood(e, cid)
         raise e
     except MessageDeleteForbidden:
         return False
@@ -95,10 +101,12 @@ def download_media(client: Client, file_id: str, file_ref: str, file_path: str)
         while flood_wait:
             flood_wait = False
             try:
+                rate_acquire("download")
                 result = client.download_media(message=file_id, file_ref=file_ref, file_name=file_path)
+                rate_done("download")
             except FloodWait as e:
                 flood_wait = True
-                wait_flood(e)
+                rate_flood(e, "download")
     except Exception as e:
         logger.warning(f"Download media {file_id} to {file_path} error: {e}", exc_info=True)
 
@@ -114,14 +122,16 @@ def edit_message_reply_markup(client: Client, cid: int, mid: int,
         while flood_wait:
             flood_wait = False
             try:
+                rate_acquire(cid)
                 result = client.edit_message_reply_markup(
                     chat_id=cid,
                     message_id=mid,
                     reply_markup=markup
                 )
+                rate_done(cid)
             except FloodWait as e:
                 flood_wait = True
-                wait_flood(e)
+                rate_flood(e, cid)
             except ButtonDataInvalid:
                 logger.warning(f"Edit message {mid} reply markup in {cid} - invalid markup: {markup}")
             except (ChannelInvalid, ChannelPrivate, ChatAdminRequired, PeerIdInvalid):
@@ -144,6 +154,7 @@ def edit_message_text(client: Client, cid: int, mid: int, text: str,
         while flood_wait:
             flood_wait = False
             try:
+                rate_acquire(cid)
                 result = client.edit_message_text(
                     chat_id=cid,
                     message_id=mid,
@@ -152,9 +163,10 @@ def edit_message_text(client: Client, cid: int, mid: int, text: str,
                     disable_web_page_preview=True,
                     reply_markup=markup
                 )
+                rate_done(cid)
             except FloodWait as e:
                 flood_wait = True
-                wait_flood(e)
+                rate_flood(e, cid)
             except ButtonDataInvalid:
                 logger.warning(f"Edit message {mid} text in {cid} - invalid markup: {markup}")
             except (ChannelInvalid, ChannelPrivate, ChatAdminRequired, PeerIdInvalid):
@@ -174,6 +186,7 @@ def send_document(client: Client, cid: int, document: str, file_ref: str = None,
         while flood_wait:
             flood_wait = False
             try:
+                rate_acquire(cid)
                 result = client.send_document(
                     chat_id=cid,
                     document=document,
@@ -183,9 +196,10 @@ def send_document(client: Client, cid: int, document: str, file_ref: str = None,
                     reply_to_message_id=mid,
                     reply_markup=markup
                 )
+                rate_done(cid)
             except FloodWait as e:
                 flood_wait = True
-                wait_flood(e)
+                rate_flood(e, cid)
             except ButtonDataInvalid:
                 logger.warning(f"Send document {document} to {cid} - invalid markup: {markup}")
             except (ChannelInvalid, ChannelPrivate, ChatAdminRequired, PeerIdInvalid):
@@ -208,6 +222,7 @@ def send_message(client: Client, cid: int, text: str, mid: int = None,
         while flood_wait:
             flood_wait = False
             try:
+                rate_acquire(cid)
                 result = client.send_message(
                     chat_id=cid,
                     text=text,
@@ -216,9 +231,10 @@ def send_message(client: Client, cid: int, text: str, mid: int = None,
                     reply_to_message_id=mid,
                     reply_markup=markup
                 )
+                rate_done(cid)
             except FloodWait as e:
                 flood_wait = True
-                wait_flood(e)
+                rate_flood(e, cid)
             except ButtonDataInvalid:
                 logger.warning(f"Send message to {cid} - invalid markup: {markup}")
             except (ChannelInvalid, ChannelPrivate, ChatAdminRequired, PeerIdInvalid):
@@ -239,6 +255,7 @@ def send_report_message(secs: int, client: Client, cid: int, text: str, mid: int
         if not text.strip():
             return None
 
+        rate_acquire(cid)
         result = client.send_message(
             chat_id=cid,
             text=text,
@@ -251,10 +268,12 @@ def send_report_message(secs: int, client: Client, cid: int, text: str, mid: int
         if not result:
             return None
 
+        rate_done(cid)
         mid = result.message_id
         mids = [mid]
         result = delay(secs, delete_messages, [client, cid, mids])
     except FloodWait as e:
+        rate_flood(e, cid)
         raise e
     except (ButtonDataInvalid, ButtonUrlInvalid):
         logger.warning(f"Send report message to {cid} - invalid markup: {markup}")
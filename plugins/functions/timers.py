@@ -17,14 +17,15 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import logging
-from time import sleep
+from time import sleep, time
 
 from pyrogram import Client
 
 from .. import glovar
 from .config import remove_old
 from .etc import code, general_link, get_now, lang, thread
-from .file import save
+from .file import get_digest
+from .store import store_expired, store_reset, store_snapshot
 from .channel import share_data
 from .telegram import send_message
 
@@ -33,22 +34,62 @@ logger = logging.getLogger(__name__)
 
 
 def backup_files(client: Client) -> bool:
-    # Backup data files to BACKUP
+    # Backup changed data files to BACKUP
     try:
+        # Collapse repeated requests within the backup window
+        with glovar.locks["backup"]:
+            now = time()
+
+            if now - glovar.backup_last < glovar.backup_window:
+                glovar.backup_stats["collapsed"] += 1
+                return True
+
+            glovar.backup_last = now
+
         for file in glovar.file_list:
-            # Check
-            if not eval(f"glovar.{file}"):
+            # Check, write the snapshot
+            if file == "configs" and not store_snapshot():
+                continue
+            elif file != "configs" and not eval(f"glovar.{file}"):
+                continue
+
+            # Skip the file if it has not changed since the last upload
+            digest = get_digest(f"data/{file}")
+
+            if digest and digest == glovar.backup_digests.get(file):
+                glovar.backup_stats["unchanged"] += 1
+
+                if glovar.backup_unchanged:
+                    share_data(
+                        client=client,
+                        receivers=["BACKUP"],
+                        action="backup",
+                        action_type="status",
+                        data={
+                            "type": "unchanged",
+                            "backup": glovar.backup,
+                            "file": file,
+                            "digest": digest
+                        }
+                    )
+
                 continue
 
-            # Share
-            share_data(
+            # Share, the digest is recorded after the upload succeeds
+            shared = share_data(
                 client=client,
                 receivers=["BACKUP"],
                 action="backup",
                 action_type="data",
                 data=file,
-                file=f"data/{file}"
+                file=f"data/{file}",
+                digest=digest
             )
+
+            if not shared:
+                continue
+
+            glovar.backup_stats["uploaded"] += 1
             sleep(5)
 
         return True
@@ -58,26 +99,22 @@ def backup_files(client: Client) -> bool:
     return False
 
 
-def interval_min_01(client: Client) -> bool:
-    # Execute every minute
-    glovar.locks["receive"].acquire()
+def interval_sec_01(client: Client) -> bool:
+    # Execute every second
     try:
-        # Clear old config data
-        now = get_now()
-
-        for key in list(glovar.configs):
-            time = glovar.configs[key]["time"]
+        # Clear old config data, only take the lock when some sessions are due
+        before = get_now() - 300
+        keys = store_expired(before)
 
-            if now - time < 300:
-                continue
+        if not keys:
+            return True
 
-            remove_old(client, key)
+        with glovar.locks["receive"]:
+            remove_old(client, keys, before)
 
         return True
     except Exception as e:
-        logger.warning(f"Interval min 01 error: {e}", exc_info=True)
-    finally:
-        glovar.locks["receive"].release()
+        logger.warning(f"Interval sec 01 error: {e}", exc_info=True)
 
     return False
 
@@ -85,8 +122,7 @@ def interval_min_01(client: Client) -> bool:
 def reset_data(client: Client) -> bool:
     # Reset data every month
     try:
-        glovar.configs = {}
-        save("configs")
+        store_reset({})
 
         # Send debug message
         text = (f"{lang('project')}{lang('colon')}{general_link(glovar.project_name, glovar.project_link)}\n"
@@ -0,0 +1,72 @@
+# SCP-079-CONFIG - Manage the settings of each bot
+# Copyright (C) 2019-2020 SCP-079 <https://scp-079.org>
+#
+# This file is part of SCP-079-CONFIG.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+import sys
+from json import dumps, loads
+from threading import Lock
+from types import ModuleType
+from typing import Callable, List
+
+from .. import glovar
+from .etc import thread
+
+# Enable logging
+logger = logging.getLogger(__name__)
+
+# The bus is shared by every bot in the process, whatever package it is loaded from
+bus = sys.modules.setdefault("scp_079_bus", ModuleType("scp_079_bus"))
+bus.__dict__.setdefault("lock", Lock())
+bus.__dict__.setdefault("peers", {})
+
+
+def transport_register(receive: Callable) -> bool:
+    # Register this bot on the in-process bus, the callback receives the record
+    result = False
+
+    try:
+        with bus.lock:
+            bus.peers[glovar.sender] = receive
+
+        result = True
+    except Exception as e:
+        logger.warning(f"Transport register error: {e}", exc_info=True)
+
+    return result
+
+
+def transport_send(receivers: List[str], record: dict) -> List[str]:
+    # Deliver the record to the receivers on the bus, return the receivers that are not on it
+    result = receivers
+
+    try:
+        with bus.lock:
+            peers = {receiver: bus.peers[receiver] for receiver in receivers if receiver in bus.peers}
+
+        # Each peer gets its own copy, as if it was read from the channel
+        text = dumps(record)
+
+        for receiver in peers:
+            thread(peers[receiver], (loads(text),))
+
+        glovar.transport_stats["delivered"] += len(peers)
+        result = [receiver for receiver in receivers if receiver not in peers]
+    except Exception as e:
+        logger.warning(f"Transport send error: {e}", exc_info=True)
+
+    return result
@@ -18,12 +18,17 @@
 
 import logging
 import pickle
+from collections import OrderedDict
 from configparser import RawConfigParser
-from os import mkdir
+from heapq import heapify
+from json import dumps, loads
+from os import mkdir, remove
 from os.path import exists
-from shutil import rmtree
+from shutil import copyfile, rmtree
+from sqlite3 import Connection, connect
+from queue import PriorityQueue, Queue
 from threading import Lock
-from typing import Dict, List, Union
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
 # Enable logging
 logging.basicConfig(
@@ -51,10 +56,32 @@ test_group_id: int = 0
 
 # [custom]
 aio: Union[bool, str] = ""
+ask_supersede: Union[bool, str] = ""
 backup: Union[bool, str] = ""
+backup_unchanged: Union[bool, str] = ""
+backup_window: float = 300.0
+compress: str = "none"
+compress_level: int = 6
+crypt_buffer: int = 1024
+crypt_engine: str = "pyaescrypt"
 date_reset: str = ""
+envelope: Union[bool, str] = ""
+envelope_size: int = 3500
+envelope_window: float = 0.5
+file_limit: int = 20
 project_link: str = ""
 project_name: str = ""
+rate_chat: float = 1.0
+rate_global: float = 30.0
+pool_crypto: str = "2, 16, block"
+pool_io: str = "2, 64, block"
+pool_telegram: str = "8, 256, caller"
+save_window: float = 0.25
+store: str = "dict"
+transport: str = "telegram"
+transport_audit: Union[bool, str] = ""
+wire: str = "json"
+wire_compress: int = 1024
 zh_cn: Union[bool, str] = ""
 
 # [encrypt]
@@ -79,11 +106,37 @@ try:
     # [custom]
     aio = config["custom"].get("aio", aio)
     aio = eval(aio)
+    ask_supersede = config["custom"].get("ask_supersede", "False")
+    ask_supersede = eval(ask_supersede)
     backup = config["custom"].get("backup", backup)
     backup = eval(backup)
+    backup_unchanged = config["custom"].get("backup_unchanged", "False")
+    backup_unchanged = eval(backup_unchanged)
+    backup_window = float(config["custom"].get("backup_window", str(backup_window)))
+    compress = config["custom"].get("compress", compress)
+    compress_level = int(config["custom"].get("compress_level", str(compress_level)))
+    crypt_buffer = int(config["custom"].get("crypt_buffer", str(crypt_buffer)))
+    crypt_engine = config["custom"].get("crypt_engine", crypt_engine)
     date_reset = config["custom"].get("date_reset", date_reset)
+    envelope = config["custom"].get("envelope", "False")
+    envelope = eval(envelope)
+    envelope_size = int(config["custom"].get("envelope_size", str(envelope_size)))
+    envelope_window = float(config["custom"].get("envelope_window", str(envelope_window)))
+    file_limit = int(config["custom"].get("file_limit", str(file_limit)))
     project_link = config["custom"].get("project_link", project_link)
     project_name = config["custom"].get("project_name", project_name)
+    pool_crypto = config["custom"].get("pool_crypto", pool_crypto)
+    pool_io = config["custom"].get("pool_io", pool_io)
+    pool_telegram = config["custom"].get("pool_telegram", pool_telegram)
+    rate_chat = float(config["custom"].get("rate_chat", str(rate_chat)))
+    rate_global = float(config["custom"].get("rate_global", str(rate_global)))
+    save_window = float(config["custom"].get("save_window", str(save_window)))
+    store = config["custom"].get("store", store)
+    transport = config["custom"].get("transport", transport)
+    transport_audit = config["custom"].get("transport_audit", "False")
+    transport_audit = eval(transport_audit)
+    wire = config["custom"].get("wire", wire)
+    wire_compress = int(config["custom"].get("wire_compress", str(wire_compress)))
     zh_cn = config["custom"].get("zh_cn", zh_cn)
     zh_cn = eval(zh_cn)
 
@@ -92,6 +145,16 @@ try:
 except Exception as e:
     logger.warning(f"Read data from config.ini error: {e}", exc_info=True)
 
+# Pool settings: workers, queue size and the policy when the queue is full
+pool_settings: Dict[str, Tuple[int, int, str]] = {}
+
+try:
+    for pool_name, pool_setting in [("crypto", pool_crypto), ("io", pool_io), ("telegram", pool_telegram)]:
+        pool_size, pool_limit, pool_policy = [s.strip() for s in pool_setting.split(",")]
+        pool_settings[pool_name] = (int(pool_size), int(pool_limit), pool_policy)
+except Exception as e:
+    logger.warning(f"Read pool settings error: {e}", exc_info=True)
+
 # Check
 if (bot_token in {"", "[DATA EXPUNGED]"}
         or prefix == []
@@ -102,10 +165,33 @@ if (bot_token in {"", "[DATA EXPUNGED]"}
         or hide_channel_id == 0
         or test_group_id == 0
         or aio not in {False, True}
+        or ask_supersede not in {False, True}
         or backup not in {False, True}
+        or backup_unchanged not in {False, True}
+        or backup_window < 0
+        or compress not in {"lzma", "none", "zlib"}
+        or compress_level not in range(10)
+        or crypt_buffer <= 0
+        or crypt_engine not in {"native", "pyaescrypt"}
         or date_reset in {"", "[DATA EXPUNGED]"}
+        or envelope not in {False, True}
+        or envelope_size <= 0
+        or envelope_window < 0
+        or file_limit <= 0
         or project_link in {"", "[DATA EXPUNGED]"}
         or project_name in {"", "[DATA EXPUNGED]"}
+        or len(pool_settings) != 3
+        or any(s[0] < 1 or s[1] < 0 or s[2] not in {"block", "caller", "drop"} for s in pool_settings.values())
+        or pool_settings["crypto"][2] != "block"
+        or rate_chat <= 0
+        or rate_global <= 0
+        or save_window < 0
+        or store not in {"dict", "sqlite"}
+        or transport not in {"bus", "telegram"}
+        or (transport == "bus" and not aio)
+        or transport_audit not in {False, True}
+        or wire not in {"compact", "json"}
+        or wire_compress < 0
         or zh_cn not in {False, True}
         or password in {"", "[DATA EXPUNGED]"}):
     logger.critical("No proper settings")
@@ -253,12 +339,122 @@ lang: Dict[str, str] = {
 
 all_commands: List[str] = ["version"]
 
+# The digests of the uploaded data files, an unchanged file is not uploaded again
+backup_digests: Dict[str, str] = {}
+
+backup_last: float = 0.0
+
+backup_stats: Dict[str, int] = {
+    "collapsed": 0,
+    "unchanged": 0,
+    "uploaded": 0
+}
+
+button_parsed: Dict[str, Tuple[str, Optional[str], Union[bool, int, None]]] = {}
+
+button_version: str = "1"
+
+button_commit: str = f"{button_version}c"
+button_none: str = f"{button_version}n"
+
+# The decompressed data of a received file is limited to file_limit times this ratio
+file_ratio: int = 10
+
+journal_compacting: bool = False
+
+journal_count: int = 0
+
+journal_limit: int = 1000
+
+journal_path: str = "data/configs.journal"
+
 locks: Dict[str, Lock] = {
-    "receive": Lock()
+    "backup": Lock(),
+    "journal": Lock(),
+    "markup": Lock(),
+    "pool": Lock(),
+    "rate": Lock(),
+    "receive": Lock(),
+    "save": Lock(),
+    "seen": Lock(),
+    "share": Lock(),
+    "store": Lock()
+}
+
+markup_cache: Dict[Tuple[str, str, str], Any] = OrderedDict()
+
+markup_limit: int = 256
+
+markup_sent: Dict[int, str] = {}
+
+markup_stats: Dict[str, int] = {
+    "hit": 0,
+    "miss": 0,
+    "suppressed": 0
+}
+
+pools: Dict[str, Queue] = {}
+
+pool_stats: Dict[str, Dict[str, Union[int, float]]] = {
+    name: {
+        "submitted": 0,
+        "completed": 0,
+        "rejected": 0,
+        "inline": 0,
+        "depth_max": 0,
+        "wait_total": 0.0,
+        "wait_max": 0.0
+    }
+    for name in pool_settings
+}
+
+# Token buckets of Telegram requests, the key None is the global bucket
+rate_buckets: Dict[Optional[int], Dict[str, float]] = {}
+
+rate_floor: float = 0.1
+
+rate_increase: float = 0.05
+
+rate_stats: Dict[str, Union[int, float]] = {
+    "acquired": 0,
+    "flood": 0,
+    "waited": 0.0
+}
+
+save_dirty: Set[str] = set()
+
+save_stats: Dict[str, int] = {
+    "requested": 0,
+    "coalesced": 0,
+    "flushed": 0
+}
+
+# Received exchange data, an LRU of (chat id, message id) and (sender, request id)
+seen_cache: Dict[Tuple[Union[int, str], Union[int, str]], bool] = OrderedDict()
+
+seen_limit: int = 4096
+
+seen_stats: Dict[str, int] = {
+    "hit": 0,
+    "miss": 0
 }
 
 sender: str = "CONFIG"
 
+transport_stats: Dict[str, int] = {
+    "delivered": 0,
+    "audit": 0
+}
+
+sender_quoted: str = f'"{sender}"'
+
+# Outbound queues of the exchange channel, the file lane keeps uploads away from other data
+share_count: int = 0
+
+share_queues: Dict[str, PriorityQueue] = {}
+
+share_stats: Dict[str, Dict[str, Union[int, float]]] = {}
+
 should_hide: bool = False
 
 version: str = "0.3.3"
@@ -336,6 +532,112 @@ for file in file_list:
         logger.critical(f"Load data {file} backup error: {e}", exc_info=True)
         raise SystemExit("[DATA CORRUPTION]")
 
+# Load the digests of the uploaded data files, they are only an optimization
+try:
+    if exists("data/backup_digests"):
+        with open("data/backup_digests", "rb") as f:
+            backup_digests = pickle.load(f)
+except Exception as e:
+    logger.warning(f"Load backup digests error: {e}", exc_info=True)
+
+# Replay the journal of config sessions, then compact it into the snapshot
+try:
+    if exists(journal_path):
+        with open(journal_path, "r") as f:
+            for line in f:
+                try:
+                    record = loads(line)
+                except ValueError:
+                    # A torn write at the tail of the journal
+                    continue
+
+                action = record["a"]
+                key = record["k"]
+                data = record["d"]
+
+                if action == "create":
+                    configs[key] = data
+                elif not configs.get(key):
+                    continue
+                elif action in {"toggle", "default"}:
+                    configs[key]["config"] = data
+                elif action == "commit":
+                    configs[key]["config"] = data
+                    configs[key]["commit"] = True
+                elif action == "bind" and isinstance(data, dict):
+                    configs[key].update(data)
+                elif action == "bind":
+                    configs[key]["message_id"] = data
+                elif action == "refresh":
+                    configs[key]["time"] = data
+                elif action == "expire":
+                    configs.pop(key, {})
+
+        with open("data/.configs", "wb") as f:
+            pickle.dump(configs, f)
+
+        copyfile("data/.configs", "data/configs")
+        remove(journal_path)
+except Exception as e:
+    logger.critical(f"Replay journal error: {e}", exc_info=True)
+    raise SystemExit("[DATA CORRUPTION]")
+
+# Open the SQLite store of config sessions
+connection: Optional[Connection] = None
+
+if store == "sqlite":
+    try:
+        migrate = not exists("data/configs.db")
+        connection = connect("data/configs.db", check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                           "key TEXT PRIMARY KEY, "
+                           "type TEXT, "
+                           "group_id INTEGER, "
+                           "user_id INTEGER, "
+                           "message_id INTEGER, "
+                           "time INTEGER, "
+                           "locked INTEGER DEFAULT 0, "
+                           "committed INTEGER DEFAULT 0, "
+                           "data TEXT)")
+
+        for column in ["time", "group_id", "user_id", "type", "message_id"]:
+            connection.execute(f"CREATE INDEX IF NOT EXISTS sessions_{column} ON sessions ({column})")
+
+        # Locks do not survive a restart
+        connection.execute("UPDATE sessions SET locked = 0")
+
+        # Import the pickled sessions on the first start
+        if migrate:
+            connection.execute("BEGIN")
+            connection.executemany(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(key, session["type"], session["group_id"], session["user_id"], session.get("message_id"),
+                  session["time"], 0, int(session["commit"]), dumps(session))
+                 for key, session in configs.items()]
+            )
+            connection.execute("COMMIT")
+
+        # Sessions live in the database from now on
+        configs = {}
+    except Exception as e:
+        logger.critical(f"Open store error: {e}", exc_info=True)
+        raise SystemExit("[DATA CORRUPTION]")
+
+# Build the ask index of live config sessions, (group id, type, user id) -> key
+asks: Dict[Tuple[int, str, int], str] = {
+    (configs[key]["group_id"], configs[key]["type"], configs[key]["user_id"]): key
+    for key in configs if not configs[key]["commit"]
+}
+
+# Build the expiry index of config sessions, a min-heap of (time, key)
+expiry: List[Tuple[int, str]] = [(configs[key]["time"], key) for key in configs]
+heapify(expiry)
+
+# Build the message index of config sessions, message id -> key
+messages: Dict[int, str] = {configs[key]["message_id"]: key for key in configs if configs[key].get("message_id")}
+
 # Start program
 copyright_text = (f"SCP-079-{sender} v{version}, Copyright (C) 2019-2020 SCP-079 <https://scp-079.org>\n"
                   "Licensed under the terms of the GNU General Public License v3 or later (GPLv3+)\n")
@@ -18,16 +18,15 @@
 
 import logging
 from copy import deepcopy
-from json import loads
 
 from pyrogram import Client, CallbackQuery
 
 from .. import glovar
-from ..functions.config import commit_change, conflict_config, get_config_message, set_default
-from ..functions.etc import lang, thread
-from ..functions.file import save
+from ..functions.config import commit_change, conflict_config, edit_config_markup, set_default
+from ..functions.etc import button_parse, lang, thread
 from ..functions.filters import config_channel
-from ..functions.telegram import answer_callback, edit_message_reply_markup
+from ..functions.store import store_get, store_key, store_lock, store_unlock, store_update
+from ..functions.telegram import answer_callback
 
 # Enable logging
 logger = logging.getLogger(__name__)
@@ -41,37 +40,54 @@ def answer(client: Client, callback_query: CallbackQuery) -> bool:
         cid = callback_query.message.chat.id
         uid = callback_query.from_user.id
         mid = callback_query.message.message_id
-        callback_data = loads(callback_query.data)
-        action = callback_data["a"]
-        action_type = callback_data["t"]
-        data = callback_data["d"]
+        callback_data = callback_query.data
+
+        # Answer the label buttons by the prefix
+        if callback_data == glovar.button_none:
+            thread(answer_callback, (client, callback_query.id, ""))
+            return True
+
+        # Get the key, reject stale keyboards before parsing
+        key = store_key(mid)
+
+        if not key:
+            thread(answer_callback, (client, callback_query.id, lang("invalid_key")))
+            return True
+
+        # The commit button needs no parsing
+        if callback_data == glovar.button_commit:
+            action, action_type, data = "commit", None, None
+        else:
+            action, action_type, data = button_parse(callback_data)
 
         # Answer the callback
         if action == "none":
             thread(answer_callback, (client, callback_query.id, ""))
             return True
 
-        # Get the key
-        key = callback_query.message.text.split("\n")[0].split(lang('colon'))[1]
-
         # Check the key
-        if not glovar.configs.get(key):
+        session = store_get(key)
+
+        if not session:
             thread(answer_callback, (client, callback_query.id, lang("invalid_key")))
             return True
 
         # Check user's permission with this config session
-        aid = glovar.configs[key]["user_id"]
+        aid = session["user_id"]
 
         if uid != aid:
             return True
 
-        # Check whether the config is locked
-        if glovar.configs[key]["lock"] or glovar.configs[key]["commit"]:
+        # Lock the config status until bot answers callback, avoid multiple responses
+        if not store_lock(key):
             return True
 
         try:
-            # Lock the config status until bot answers callback, avoid multiple responses
-            glovar.configs[key]["lock"] = True
+            # Read the session again, the copy read before the lock may be stale with the sqlite store
+            session = store_get(key)
+
+            if not session:
+                return True
 
             # Commit the changes if user press commit button, else change some settings
             if action == "commit":
@@ -79,51 +95,51 @@ def answer(client: Client, callback_query: CallbackQuery) -> bool:
                 return True
 
             # Not default settings
-            glovar.configs[key]["config"]["default"] = False
-            config_type = glovar.configs[key]["type"]
+            session["config"]["default"] = False
+            config_type = session["type"]
 
             # Set to default settings
             if action == "default":
-                set_default(key)
+                set_default(session)
 
             # CAPTCHA
             elif config_type == "captcha":
-                glovar.configs[key]["config"][action] = data
+                session["config"][action] = data
 
             # CLEAN
             elif config_type == "clean":
-                glovar.configs[key]["config"][action] = data
+                session["config"][action] = data
 
             # LANG
             elif config_type == "lang":
                 if action in {"name", "text", "sticker", "bio"}:
                     if action_type == "enable":
-                        if not glovar.configs[key]["config"].get(action, {}):
-                            glovar.configs[key]["config"][action] = {}
+                        if not session["config"].get(action, {}):
+                            session["config"][action] = {}
 
-                        glovar.configs[key]["config"][action]["default"] = False
-                        glovar.configs[key]["config"][action][action_type] = data
+                        session["config"][action]["default"] = False
+                        session["config"][action][action_type] = data
                     elif action_type == "default":
-                        default_config = deepcopy(glovar.configs[key]["default"][action])
-                        glovar.configs[key]["config"][action] = default_config
+                        default_config = deepcopy(session["default"][action])
+                        session["config"][action] = default_config
                 else:
-                    glovar.configs[key]["config"][action] = data
+                    session["config"][action] = data
 
             # LONG
             elif config_type == "long":
-                glovar.configs[key]["config"][action] = data
+                session["config"][action] = data
 
             # NOFLOOD
             elif config_type == "noflood":
-                glovar.configs[key]["config"][action] = data
+                session["config"][action] = data
 
             # NOPORN
             elif config_type == "noporn":
-                glovar.configs[key]["config"][action] = data
+                session["config"][action] = data
 
             # NOSPAM
             elif config_type == "nospam":
-                glovar.configs[key]["config"][action] = data
+                session["config"][action] = data
 
                 config_list = ["deleter", "reporter"]
 
@@ -131,24 +147,24 @@ def answer(client: Client, callback_query: CallbackQuery) -> bool:
                     config_list.remove(action)
 
                     for other in config_list:
-                        glovar.configs[key]["config"][other] = False
+                        session["config"][other] = False
 
             # RECHECK
             elif config_type == "recheck":
-                glovar.configs[key]["config"][action] = data
+                session["config"][action] = data
 
             # TIP
             elif config_type == "tip":
-                glovar.configs[key]["config"][action] = data
-                glovar.configs[key]["config"] = conflict_config(
-                    config=glovar.configs[key]["config"],
+                session["config"][action] = data
+                session["config"] = conflict_config(
+                    config=session["config"],
                     config_list=["cancel", "hold"],
                     master=action
                 )
 
             # USER
             elif config_type == "user":
-                glovar.configs[key]["config"][action] = data
+                session["config"][action] = data
 
                 config_list = ["gb", "gr", "gd"]
 
@@ -156,7 +172,7 @@ def answer(client: Client, callback_query: CallbackQuery) -> bool:
                     config_list.remove(action)
 
                     for other in config_list:
-                        glovar.configs[key]["config"][other] = False
+                        session["config"][other] = False
 
                 config_list = ["sb", "sr", "sd"]
 
@@ -164,23 +180,24 @@ def answer(client: Client, callback_query: CallbackQuery) -> bool:
                     config_list.remove(action)
 
                     for other in config_list:
-                        glovar.configs[key]["config"][other] = False
+                        session["config"][other] = False
 
             # WARN
             elif config_type == "warn":
                 if action in {"delete", "restrict", "limit", "mention"}:
-                    glovar.configs[key]["config"][action] = data
+                    session["config"][action] = data
                 elif action == "report":
-                    if not glovar.configs[key]["config"].get("report", {}):
-                        glovar.configs[key]["config"]["report"] = {}
+                    if not session["config"].get("report", {}):
+                        session["config"]["report"] = {}
+
+                    session["config"]["report"][action_type] = data
 
-                    glovar.configs[key]["config"]["report"][action_type] = data
+            # Record the change
+            store_update(key, session, "default" if action == "default" else "toggle")
 
-            _, markup = get_config_message(key)
-            edit_message_reply_markup(client, cid, mid, markup)
+            edit_config_markup(client, cid, mid, session)
         finally:
-            glovar.configs[key]["lock"] = False
-            save("configs")
+            store_unlock(key)
             thread(answer_callback, (client, callback_query.id, ""))
 
         return True
@@ -22,10 +22,9 @@ from pyrogram import Client, Filters, Message
 
 from .. import glovar
 from ..functions.etc import code, general_link, lang, thread
-from ..functions.filters import aio, exchange_channel, hide_channel
-from ..functions.receive import receive_config_ask, receive_rollback, receive_text_data
+from ..functions.filters import aio, exchange_channel, hide_channel, to_sender
+from ..functions.receive import receive_record, receive_records, receive_seen
 from ..functions.telegram import send_message
-from ..functions.timers import backup_files
 
 # Enable logging
 logger = logging.getLogger(__name__)
@@ -37,26 +36,16 @@ def exchange_emergency(client: Client, message: Message) -> bool:
     # Sent emergency channel transfer request
     try:
         # Read basic information
-        data = receive_text_data(message)
+        records = receive_records(message)
+        data = next((record for record in records if "EMERGENCY" in record["to"]
+                     and record["action"] == "backup" and record["type"] == "hide"), None)
 
         if not data:
             return True
 
         sender = data["from"]
-        receivers = data["to"]
-        action = data["action"]
-        action_type = data["type"]
         data = data["data"]
 
-        if "EMERGENCY" not in receivers:
-            return True
-
-        if action != "backup":
-            return True
-
-        if action_type != "hide":
-            return True
-
         if data is True:
             glovar.should_hide = data
         elif data is False and sender == "MANAGE":
@@ -78,46 +67,27 @@ def exchange_emergency(client: Client, message: Message) -> bool:
 
 @Client.on_message((Filters.incoming | aio) & Filters.channel
                    & ~Filters.command(glovar.all_commands, glovar.prefix)
-                   & exchange_channel)
+                   & exchange_channel & to_sender)
 def process_data(client: Client, message: Message) -> bool:
     # Process the data in exchange channel
     result = False
 
-    glovar.locks["receive"].acquire()
-
     try:
-        data = receive_text_data(message)
-
-        if not data:
+        # Drop the message delivered again
+        if receive_seen((message.chat.id, message.message_id)):
             return False
 
-        sender = data["from"]
-        receivers = data["to"]
-        action = data["action"]
-        action_type = data["type"]
-        data = data["data"]
-
-        if glovar.sender in receivers:
+        # Parse and check the data without the lock
+        records = receive_records(message)
 
-            if sender in {"CAPTCHA", "CLEAN", "LANG", "LONG", "NOFLOOD", "NOPORN",
-                          "NOSPAM", "TIP", "USER", "WARN"}:
-
-                if action == "config":
-                    if action_type == "ask":
-                        receive_config_ask(client, sender, data)
-
-            elif sender == "MANAGE":
+        if not records:
+            return False
 
-                if action == "backup":
-                    if action_type == "now":
-                        thread(backup_files, (client,))
-                    elif action_type == "rollback":
-                        receive_rollback(client, message, data)
+        for record in records:
+            receive_record(client, record, message)
 
         result = True
     except Exception as e:
         logger.warning(f"Process data error: {e}", exc_info=True)
-    finally:
-        glovar.locks["receive"].release()
 
     return result
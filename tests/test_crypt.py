@@ -0,0 +1,111 @@
+# SCP-079-CONFIG - Manage the settings of each bot
+# Copyright (C) 2019-2020 SCP-079 <https://scp-079.org>
+#
+# This file is part of SCP-079-CONFIG.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Interop tests of the AES Crypt engines, run from the project root: python -m unittest tests.test_crypt
+
+import sys
+import unittest
+from io import BytesIO
+from os import urandom
+from os.path import abspath, dirname
+from types import ModuleType
+
+# The real glovar reads config.ini on import, the engines only need these settings
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+glovar = ModuleType("plugins.glovar")
+glovar.crypt_buffer = 64
+glovar.crypt_engine = "native"
+glovar.password = "pässwörd"
+sys.modules.setdefault("plugins.glovar", glovar)
+
+from plugins.functions import crypt  # noqa: E402
+
+engines = ["native", "pyaescrypt"]
+sizes = [0, 1, 15, 16, 17, 64 * 1024, 3 * 64 * 1024 + 5]
+
+
+def encrypt(engine: str, data: bytes) -> bytes:
+    # Encrypt the data with the engine
+    crypt.glovar.crypt_engine = engine
+    f_out = BytesIO()
+    crypt.encrypt_stream(BytesIO(data), f_out)
+
+    return f_out.getvalue()
+
+
+def decrypt(engine: str, data: bytes) -> bytes:
+    # Decrypt the data with the engine
+    crypt.glovar.crypt_engine = engine
+    f_out = BytesIO()
+    crypt.decrypt_stream(BytesIO(data), f_out, len(data))
+
+    return f_out.getvalue()
+
+
+class TestCrypt(unittest.TestCase):
+
+    def test_interop(self) -> None:
+        # Each engine reads the output of the other one
+        for size in sizes:
+            data = urandom(size)
+
+            for engine_in in engines:
+                encrypted = encrypt(engine_in, data)
+
+                for engine_out in engines:
+                    with self.subTest(size=size, engine_in=engine_in, engine_out=engine_out):
+                        self.assertEqual(decrypt(engine_out, encrypted), data)
+
+    def test_tamper(self) -> None:
+        # A changed byte of the ciphertext is rejected by both engines and by the HMAC check
+        for engine_in in engines:
+            encrypted = bytearray(encrypt(engine_in, urandom(1000)))
+            encrypted[-40] ^= 1
+            encrypted = bytes(encrypted)
+
+            for engine_out in engines:
+                with self.subTest(engine_in=engine_in, engine_out=engine_out):
+                    with self.assertRaises(ValueError):
+                        decrypt(engine_out, encrypted)
+
+            with self.assertRaises(ValueError):
+                crypt.verify_stream(BytesIO(encrypted), len(encrypted))
+
+    def test_verify(self) -> None:
+        # The HMAC check accepts the output of both engines
+        for engine_in in engines:
+            encrypted = encrypt(engine_in, urandom(3 * 64 * 1024 + 5))
+            crypt.verify_stream(BytesIO(encrypted), len(encrypted))
+
+    def test_password(self) -> None:
+        # A wrong password is rejected
+        encrypted = encrypt("native", urandom(100))
+        password = crypt.glovar.password
+        crypt.glovar.password = "wrong"
+
+        try:
+            for engine_out in engines:
+                with self.subTest(engine_out=engine_out):
+                    with self.assertRaises(ValueError):
+                        decrypt(engine_out, encrypted)
+        finally:
+            crypt.glovar.password = password
+
+
+if __name__ == "__main__":
+    unittest.main()